@@ -5,7 +5,12 @@ from sqlalchemy import pool
 from db.database import Base
 from alembic import context
 from dotenv import load_dotenv
+from core import migrate
 from models.expense_model import Expense
+from models.report_view_model import ExpenseMonthlyCategory
+from models.bulk_delete_job_model import BulkDeleteJob
+from models.idempotency_key_model import IdempotencyKey
+from models.stream_ticket_model import StreamTicket
 
 load_dotenv()
 
@@ -26,6 +31,13 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 target_metadata = Base.metadata
 
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Skip materialized views mapped as read-only models."""
+    if type_ == "table" and object.info.get("is_view"):
+        return False
+    return True
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -50,6 +62,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -70,12 +83,26 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
-        context.configure(
-            connection=connection, target_metadata=target_metadata
-        )
-
-        with context.begin_transaction():
-            context.run_migrations()
+        # Only one replica migrates; the rest wait for it and find nothing to do
+        migrate.acquire_leader_lock(connection)
+        try:
+            migrate.set_session_timeouts(connection)
+            context.configure(
+                connection=connection,
+                target_metadata=target_metadata,
+                include_object=include_object,
+                # Commit each revision so a lock_timeout retry resumes at the failed one
+                transaction_per_migration=True,
+                on_version_apply=migrate.step_timer(),
+            )
+
+            def run():
+                with context.begin_transaction():
+                    context.run_migrations()
+
+            migrate.run_with_lock_retries(run)
+        finally:
+            migrate.release_leader_lock(connection)
 
 
 if context.is_offline_mode():
@@ -0,0 +1,22 @@
+"""bulk delete job attempts
+
+Revision ID: bulk_delete_job_attempts
+Revises: expenses_user_fk
+Create Date: 2025-09-03 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'bulk_delete_job_attempts'
+down_revision = 'expenses_user_fk'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Constant default: no table rewrite
+    op.execute("ALTER TABLE bulk_delete_jobs ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0")
+
+def downgrade():
+    op.drop_column('bulk_delete_jobs', 'attempts')
@@ -0,0 +1,71 @@
+"""bulk delete jobs and expense generations
+
+Revision ID: bulk_delete_jobs
+Revises: expense_search_indexes
+Create Date: 2025-08-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from core.migration_helpers import replace_materialized_view
+
+# revision identifiers, used by Alembic.
+revision = 'bulk_delete_jobs'
+down_revision = 'expense_search_indexes'
+branch_labels = None
+depends_on = None
+
+MONTHLY_CATEGORY_VIEW = """
+    SELECT e.user_id,
+           date_trunc('month', coalesce(e.date, e.created_at)) AS month,
+           e.category,
+           sum(e.amount) AS total_amount,
+           count(e.id) AS count
+    FROM expenses e
+    {join}
+    WHERE e.user_id IS NOT NULL AND coalesce(e.date, e.created_at) IS NOT NULL
+    GROUP BY e.user_id, date_trunc('month', coalesce(e.date, e.created_at)), e.category
+"""
+
+def _recreate_view(join: str):
+    replace_materialized_view(
+        'expense_monthly_category_mv',
+        MONTHLY_CATEGORY_VIEW.format(join=join),
+        ['user_id', 'month', 'category']
+    )
+    op.execute(
+        "UPDATE report_view_state SET refreshed_at = now() "
+        "WHERE view_name = 'expense_monthly_category_mv'"
+    )
+
+def upgrade():
+    # Expenses are visible only while their generation matches the user's;
+    # bumping the user's generation hides everything queued for deletion.
+    # Constant defaults do not rewrite the table.
+    op.add_column('users', sa.Column('expense_generation', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('expenses', sa.Column('generation', sa.Integer(), nullable=False, server_default='0'))
+
+    op.create_table('bulk_delete_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('generation', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('deleted_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('error', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_bulk_delete_jobs_status', 'bulk_delete_jobs', ['status'], unique=False)
+
+    # Report view only aggregates visible expenses
+    _recreate_view("JOIN users u ON u.id = e.user_id AND e.generation = u.expense_generation")
+
+def downgrade():
+    _recreate_view("")
+    op.drop_index('ix_bulk_delete_jobs_status', table_name='bulk_delete_jobs')
+    op.drop_table('bulk_delete_jobs')
+    op.drop_column('expenses', 'generation')
+    op.drop_column('users', 'expense_generation')
@@ -0,0 +1,91 @@
+"""expense amounts in integer minor units
+
+Revision ID: expense_amount_minor
+Revises: expense_change_feed
+Create Date: 2025-08-29 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from core.migration_helpers import backfill_in_batches, add_not_null_check, replace_materialized_view
+
+# revision identifiers, used by Alembic.
+revision = 'expense_amount_minor'
+down_revision = 'expense_change_feed'
+branch_labels = None
+depends_on = None
+
+# amount_minor is the source of truth: writers on this release set it
+# (schemas.expense_schema.amount_columns) and the trigger leaves it alone.
+# It is only derived, as hundredths (AMOUNT_EXPONENT), for writers that set
+# the float amount alone (pods on the previous release).
+SYNC_FUNCTION = """
+    CREATE OR REPLACE FUNCTION expenses_sync_amount_minor() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF (TG_OP = 'INSERT' AND NEW.amount_minor IS NULL)
+           OR (TG_OP = 'UPDATE' AND NEW.amount IS DISTINCT FROM OLD.amount
+               AND NEW.amount_minor IS NOT DISTINCT FROM OLD.amount_minor) THEN
+            NEW.amount_minor := round(NEW.amount::numeric * 100);
+        END IF;
+        RETURN NEW;
+    END
+    $$
+"""
+
+MONTHLY_CATEGORY_VIEW = """
+    SELECT e.user_id,
+           date_trunc('month', coalesce(e.date, e.created_at)) AS month,
+           e.category,
+           sum(e.amount) AS total_amount,
+           {minor_column}
+           count(e.id) AS count
+    FROM expenses e
+    JOIN users u ON u.id = e.user_id AND e.generation = u.expense_generation
+    WHERE e.user_id IS NOT NULL AND coalesce(e.date, e.created_at) IS NOT NULL
+    GROUP BY e.user_id, date_trunc('month', coalesce(e.date, e.created_at)), e.category
+"""
+
+def _recreate_view(minor_column: str):
+    replace_materialized_view(
+        'expense_monthly_category_mv',
+        MONTHLY_CATEGORY_VIEW.format(minor_column=minor_column),
+        ['user_id', 'month', 'category']
+    )
+    op.execute(
+        "UPDATE report_view_state SET refreshed_at = now() "
+        "WHERE view_name = 'expense_monthly_category_mv'"
+    )
+
+def upgrade():
+    # The backfill commits what comes before it, and a lock timeout on a later
+    # step re-runs this revision from the top, so every step is repeatable.
+
+    # Expand: nullable column (no rewrite) kept in sync by a trigger while
+    # pods on the previous release still write only the float amount
+    op.execute("ALTER TABLE expenses ADD COLUMN IF NOT EXISTS amount_minor BIGINT")
+    op.execute(SYNC_FUNCTION)
+    op.execute("DROP TRIGGER IF EXISTS expenses_sync_amount_minor ON expenses")
+    op.execute(
+        "CREATE TRIGGER expenses_sync_amount_minor BEFORE INSERT OR UPDATE ON expenses "
+        "FOR EACH ROW EXECUTE FUNCTION expenses_sync_amount_minor()"
+    )
+
+    # Backfill in short batches, each committed on its own
+    backfill_in_batches(
+        'expenses',
+        "amount_minor = round(amount::numeric * 100)",
+        where="amount_minor IS NULL"
+    )
+
+    add_not_null_check('expenses', 'amount_minor', 'ck_expenses_amount_minor_not_null')
+
+    # Keep total_amount for pods on the previous release
+    _recreate_view("sum(e.amount_minor) AS total_amount_minor,")
+
+def downgrade():
+    _recreate_view("")
+    op.execute("ALTER TABLE expenses DROP CONSTRAINT IF EXISTS ck_expenses_amount_minor_not_null")
+    op.execute("DROP TRIGGER IF EXISTS expenses_sync_amount_minor ON expenses")
+    op.execute("DROP FUNCTION IF EXISTS expenses_sync_amount_minor()")
+    op.drop_column('expenses', 'amount_minor')
@@ -0,0 +1,21 @@
+"""expense change feed
+
+Revision ID: expense_change_feed
+Revises: idempotency_keys
+Create Date: 2025-08-27 10:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'expense_change_feed'
+down_revision = 'idempotency_keys'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Event ids for expense change notifications (NOTIFY expense_changes)
+    op.execute("CREATE SEQUENCE IF NOT EXISTS expense_change_seq")
+
+def downgrade():
+    op.execute("DROP SEQUENCE IF EXISTS expense_change_seq")
@@ -0,0 +1,43 @@
+"""expense title search indexes
+
+Revision ID: expense_search_indexes
+Revises: report_views
+Create Date: 2025-08-11 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from core.migration_helpers import create_index_concurrently, drop_index_concurrently
+
+# revision identifiers, used by Alembic.
+revision = 'expense_search_indexes'
+down_revision = 'report_views'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # Built concurrently (outside the migration transaction) so writes continue
+    # Fuzzy, prefix and substring matches (similarity, %, ILIKE)
+    create_index_concurrently(
+        'ix_expenses_title_trgm',
+        'expenses',
+        ['title'],
+        postgresql_using='gin',
+        postgresql_ops={'title': 'gin_trgm_ops'}
+    )
+    # Word search
+    create_index_concurrently(
+        'ix_expenses_title_tsv',
+        'expenses',
+        [sa.text("to_tsvector('simple', title)")],
+        postgresql_using='gin'
+    )
+    # Per-user scoping with date filters
+    create_index_concurrently('ix_expenses_user_id_date', 'expenses', ['user_id', 'date'])
+
+def downgrade():
+    drop_index_concurrently('ix_expenses_user_id_date', 'expenses')
+    drop_index_concurrently('ix_expenses_title_tsv', 'expenses')
+    drop_index_concurrently('ix_expenses_title_trgm', 'expenses')
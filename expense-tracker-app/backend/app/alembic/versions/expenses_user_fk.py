@@ -0,0 +1,26 @@
+"""validate the expenses.user_id foreign key online
+
+Revision ID: expenses_user_fk
+Revises: stream_tickets
+Create Date: 2025-09-02 10:00:00.000000
+
+"""
+from alembic import op
+from core.migration_helpers import create_foreign_key_not_valid
+
+# revision identifiers, used by Alembic.
+revision = 'expenses_user_fk'
+down_revision = 'stream_tickets'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # complete_schema created this key with a plain ADD CONSTRAINT, which scans
+    # expenses under an exclusive lock. Databases that already have it are
+    # left alone; where it is missing it is added NOT VALID and validated
+    # without blocking writes.
+    create_foreign_key_not_valid('expenses_user_id_fkey', 'expenses', 'users', ['user_id'], ['id'])
+
+def downgrade():
+    # The key belongs to complete_schema; nothing to undo here
+    pass
@@ -0,0 +1,51 @@
+"""materialized report views
+
+Revision ID: report_views
+Revises: remove_notifications
+Create Date: 2025-08-04 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'report_views'
+down_revision = 'remove_notifications'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Per-user monthly x category aggregates
+    op.execute("""
+        CREATE MATERIALIZED VIEW expense_monthly_category_mv AS
+        SELECT user_id,
+               date_trunc('month', coalesce(date, created_at)) AS month,
+               category,
+               sum(amount) AS total_amount,
+               count(id) AS count
+        FROM expenses
+        WHERE user_id IS NOT NULL AND coalesce(date, created_at) IS NOT NULL
+        GROUP BY user_id, date_trunc('month', coalesce(date, created_at)), category
+    """)
+    # REFRESH ... CONCURRENTLY requires a unique index on the view
+    op.create_index(
+        'ux_expense_monthly_category_mv',
+        'expense_monthly_category_mv',
+        ['user_id', 'month', 'category'],
+        unique=True
+    )
+
+    # Tracks when each view was last refreshed (freshness indicator)
+    op.create_table('report_view_state',
+        sa.Column('view_name', sa.String(), nullable=False),
+        sa.Column('refreshed_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('view_name')
+    )
+    op.execute(
+        "INSERT INTO report_view_state (view_name, refreshed_at) "
+        "VALUES ('expense_monthly_category_mv', now())"
+    )
+
+def downgrade():
+    op.drop_table('report_view_state')
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS expense_monthly_category_mv")
@@ -0,0 +1,28 @@
+"""stream tickets
+
+Revision ID: stream_tickets
+Revises: expense_amount_minor
+Create Date: 2025-08-31 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'stream_tickets'
+down_revision = 'expense_amount_minor'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('stream_tickets',
+        sa.Column('ticket_hash', sa.String(length=64), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('ticket_hash')
+    )
+    op.create_index('ix_stream_tickets_expires_at', 'stream_tickets', ['expires_at'], unique=False)
+
+def downgrade():
+    op.drop_index('ix_stream_tickets_expires_at', table_name='stream_tickets')
+    op.drop_table('stream_tickets')
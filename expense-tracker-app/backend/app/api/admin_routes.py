@@ -0,0 +1,25 @@
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+from core.auth import get_current_admin
+from core import profiling
+from models.user_model import User
+
+router = APIRouter(tags=["Admin"])
+
+@router.post("/profile", response_class=PlainTextResponse)
+async def profile_process(
+    seconds: float = 10,
+    interval_ms: float = profiling.PROFILING_INTERVAL_MS,
+    current_user: User = Depends(get_current_admin)
+):
+    """Sample all threads of the worker that serves this call (named in X-Profile-Pod)"""
+    if not 0 < seconds <= profiling.PROFILING_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be between 0 and {profiling.PROFILING_MAX_SECONDS}")
+    if interval_ms < 1:
+        raise HTTPException(status_code=400, detail="interval_ms must be at least 1")
+
+    report = await asyncio.to_thread(profiling.profile_process, seconds, interval_ms)
+    if report is None:
+        raise HTTPException(status_code=409, detail="A process profile is already running")
+    return PlainTextResponse(report, headers={"X-Profile-Pod": profiling.POD_NAME})
@@ -9,6 +9,8 @@ from typing import Optional
 from fastapi import Response
 import httpx
 from fastapi import Query
+from urllib.parse import urlsplit
+from core.tracing import start_span, inject_headers
 
 router = APIRouter(tags=["Authentication"])
 
@@ -87,7 +89,9 @@ def logout():
 async def proxy_image(url: str = Query(...)):
     """Proxy image to bypass 429 errors on external services"""
     async with httpx.AsyncClient(timeout=5.0) as client:
-        r = await client.get(url)
+        with start_span(f"GET {urlsplit(url).netloc}", **{"span.kind": "client"}) as span:
+            r = await client.get(url, headers=inject_headers())
+            span.set_attribute("http.status_code", r.status_code)
 
         if r.status_code != 200:
             raise HTTPException(status_code=r.status_code, detail="Image fetch failed")
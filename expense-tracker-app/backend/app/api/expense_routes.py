@@ -1,45 +1,88 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Response, Request, Header
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from db.database import get_db
-from schemas.expense_schema import ExpenseCreate, ExpenseResponse, ExpenseUpdate, CategoryReport, MonthlyReport, Settings
+from schemas.expense_schema import ExpenseCreate, ExpenseResponse, ExpenseUpdate, CategoryReport, MonthlyReport, AnalyticsReport, ExpenseSearchResponse, BulkDeleteJobResponse, Settings, amount_columns, amounts_from_minor_units, from_minor_units
 from models.expense_model import Expense
 from models.user_model import User
 from crud import expense_crud
-from core.auth import get_current_user
-from core.categories import get_available_categories, get_random_title_for_category
-from typing import List, Dict, Any
+from core.auth import get_current_user, verify_jwt_token
+from core.categories import get_available_categories, get_random_title_for_category, normalize_category
+from core import background, report_views, bulk_delete, idempotency, change_feed
+from core.responses import FastJSONResponse
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
+import base64
+import orjson
+from datetime import date, datetime, time, timedelta
 
 router = APIRouter(tags=["Expenses"])
 
+def _expense_response(expense: Expense) -> FastJSONResponse:
+    return FastJSONResponse(ExpenseResponse.model_validate(expense).model_dump())
+
 @router.post("/", response_model=ExpenseResponse)
 def create_expense(
     expense: ExpenseCreate, 
+    request: Request,
+    idempotency_key: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    return expense_crud.create_expense(db, expense, current_user.id)
+    def handler():
+        return _expense_response(expense_crud.create_expense(db, expense, current_user.id))
+
+    return idempotency.run_idempotent(
+        db, current_user.id, idempotency_key,
+        idempotency.request_fingerprint(request, expense.model_dump_json()),
+        handler
+    )
 
-@router.get("/", response_model=List[ExpenseResponse])
+@router.get("/", response_model=List[ExpenseResponse], response_class=FastJSONResponse)
 def read_expenses(
     skip: int = 0, 
     limit: int = 100, 
+    fields: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    return expense_crud.get_expenses(db, current_user.id, skip=skip, limit=limit)
+    """List expenses; `fields` is an optional comma-separated sparse fieldset"""
+    selected = None
+    if fields:
+        selected = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+        unknown = [f for f in selected if f not in expense_crud.EXPENSE_RESPONSE_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    rows = expense_crud.get_expense_rows(db, current_user.id, skip=skip, limit=limit, fields=selected)
+    return FastJSONResponse(amounts_from_minor_units(rows))
+
+def _queue_background_jobs(background_tasks: BackgroundTasks, job_id: int):
+    # BackgroundTasks only fire after the response (so after the commit); they
+    # hand the work to the background executor instead of running it inside
+    # the request, where it would hold an in-flight slot and a request thread
+    background_tasks.add_task(background.submit, "refresh-report-views", report_views.request_refresh)
+    background_tasks.add_task(background.submit, "bulk-delete", bulk_delete.run_bulk_delete_job, job_id)
 
-@router.post("/seed", response_model=List[ExpenseResponse])
+@router.post("/seed", response_model=List[ExpenseResponse], response_class=FastJSONResponse)
 def seed_expenses(
+    background_tasks: BackgroundTasks,
+    request: Request,
     count: int = 10,
+    idempotency_key: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    from datetime import datetime, timedelta
+    return idempotency.run_idempotent(
+        db, current_user.id, idempotency_key,
+        idempotency.request_fingerprint(request),
+        lambda: _seed_expenses(background_tasks, count, db, current_user)
+    )
+
+def _seed_expenses(background_tasks: BackgroundTasks, count: int, db: Session, current_user: User):
     import random
 
-    # Clear existing data for this user first
-    db.query(Expense).filter(Expense.user_id == current_user.id).delete()
-    db.commit()
+    # Hide existing data for this user first; it is deleted in the background
+    job = bulk_delete.start_bulk_delete(db, current_user.id)
 
     # Get available categories from global configuration
     available_categories = get_available_categories()
@@ -51,32 +94,220 @@ def seed_expenses(
         # Get a random title for that category
         title = get_random_title_for_category(category)
 
-        expense = Expense(
-            user_id=current_user.id,
-            title=title,
-            amount=round(random.uniform(50, 1000), 2),
-            category=category,
-            date=datetime.now() - timedelta(days=random.randint(0, 30))
-        )
-        seed_data.append(expense)
+        seed_data.append({
+            "user_id": current_user.id,
+            "generation": job.generation,
+            "title": title,
+            "category": category,
+            **amount_columns(round(random.uniform(50, 1000), 2)),
+            "date": datetime.now() - timedelta(days=random.randint(0, 30))
+        })
 
-    db.add_all(seed_data)
-    db.commit()
+    created = expense_crud.bulk_create_expense_rows(db, seed_data)
 
-    for item in seed_data:
-        db.refresh(item)
+    _queue_background_jobs(background_tasks, job.id)
 
-    return seed_data
+    return FastJSONResponse(amounts_from_minor_units(created))
 
-@router.delete("/clear", response_model=Dict[str, str])
+@router.delete("/clear", response_model=Dict[str, str], status_code=202)
 def clear_expenses(
+    background_tasks: BackgroundTasks,
+    request: Request,
+    idempotency_key: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Clear all expenses for current user.
+
+    Expenses disappear immediately; rows are deleted by a background job
+    whose progress is available from /jobs/{job_id}.
+    """
+    def handler():
+        job = bulk_delete.start_bulk_delete(db, current_user.id)
+        _queue_background_jobs(background_tasks, job.id)
+        return JSONResponse(
+            status_code=202,
+            content={"message": "All expenses cleared successfully", "job_id": str(job.id)}
+        )
+
+    return idempotency.run_idempotent(
+        db, current_user.id, idempotency_key, idempotency.request_fingerprint(request), handler
+    )
+
+@router.get("/jobs/{job_id}", response_model=BulkDeleteJobResponse)
+def get_bulk_delete_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get the status of a background bulk delete job"""
+    job = bulk_delete.get_job(db, job_id, current_user.id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+# Change feed (must come before dynamic routes)
+def _sse(event: str, data: Any, event_id: Optional[int] = None) -> bytes:
+    message = f"event: {event}\ndata: ".encode() + orjson.dumps(data) + b"\n\n"
+    if event_id is not None:
+        message = f"id: {event_id}\n".encode() + message
+    return message
+
+@router.post("/changes/ticket")
+def create_change_feed_ticket(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Short-lived, single-use ticket for opening /changes from EventSource"""
+    if not change_feed.CHANGE_FEED_ENABLED:
+        raise HTTPException(status_code=503, detail="Change feed is not available")
+    return {
+        "ticket": change_feed.issue_ticket(db, current_user.id),
+        "expires_in": change_feed.CHANGE_FEED_TICKET_SECONDS,
+    }
+
+@router.get("/changes")
+async def expense_changes(
+    request: Request,
+    ticket: Optional[str] = None,
+    last_event_id: Optional[int] = None,
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID")
+):
+    """Server-sent events with the current user's expense changes.
+
+    Events are created/updated/deleted deltas, reset (seed or clear) and
+    resync (re-fetch everything); each batch is followed by a reports hint
+    unless reports are served from the materialized view.
+    EventSource cannot send headers, so browsers authenticate with ?ticket=
+    from POST /changes/ticket; other clients may send the JWT as a header.
+    """
+    if not change_feed.CHANGE_FEED_ENABLED or not change_feed.hub.running:
+        raise HTTPException(status_code=503, detail="Change feed is not available")
+    authorization = request.headers.get("Authorization", "")
+    if authorization.startswith("Bearer "):
+        user_id = verify_jwt_token(authorization[len("Bearer "):]).get("user_id")
+        if user_id is None:
+            raise HTTPException(status_code=401, detail="Invalid token payload")
+    elif ticket:
+        user_id = await asyncio.to_thread(change_feed.redeem_ticket, ticket)
+        if user_id is None:
+            raise HTTPException(status_code=401, detail="Invalid or expired ticket")
+    else:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    if last_event_id_header:
+        try:
+            last_event_id = int(last_event_id_header)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+
+    async def stream():
+        # Subscribed only once the response is iterated, so a response that is
+        # never sent cannot leave a subscription behind
+        subscription = change_feed.hub.subscribe(user_id, last_event_id)
+        try:
+            yield b"retry: 5000\n\n"
+            while True:
+                try:
+                    events = [await asyncio.wait_for(
+                        subscription.queue.get(), change_feed.CHANGE_FEED_HEARTBEAT_SECONDS
+                    )]
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                while not subscription.queue.empty():
+                    events.append(subscription.queue.get_nowait())
+
+                # Events carry ids only; load the batch's rows in one query
+                rows = await asyncio.to_thread(change_feed.load_expense_rows, user_id, list({
+                    event["expense_id"] for event in events
+                    if event is not change_feed.RESYNC and event["type"] in ("created", "updated")
+                }))
+
+                chunk = b""
+                for event in events:
+                    if event is change_feed.RESYNC:
+                        chunk += _sse("resync", {})
+                    elif event["type"] in ("created", "updated"):
+                        row = rows.get(event["expense_id"])
+                        # Gone since: a deleted or reset event follows
+                        if row is not None:
+                            chunk += _sse(event["type"], amounts_from_minor_units(dict(row)), event["id"])
+                    elif event["type"] == "deleted":
+                        chunk += _sse("deleted", {"id": event["expense_id"]}, event["id"])
+                    else:
+                        chunk += _sse(event["type"], {}, event["id"])
+                # One reports hint per batch, so bursts cost clients one re-fetch.
+                # View-backed reports only change on refresh, so a hint after a
+                # write would only make clients reload the same stale totals.
+                if not report_views.REPORT_VIEWS_ENABLED:
+                    chunk += _sse("reports", {})
+                if chunk:
+                    yield chunk
+        finally:
+            change_feed.hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# Search routes (must come before dynamic routes)
+def _encode_cursor(cursor: Optional[Tuple[float, int]]) -> Optional[str]:
+    if cursor is None:
+        return None
+    score, expense_id = cursor
+    return base64.urlsafe_b64encode(f"{score!r}:{expense_id}".encode()).decode()
+
+def _decode_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        score, expense_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+        return float(score), int(expense_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _filter_category(category: Optional[str]) -> Optional[str]:
+    """Canonical name for a ?category= filter (any case), 400 if unknown"""
+    if category is None:
+        return None
+    try:
+        return normalize_category(category)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/search", response_model=ExpenseSearchResponse, response_class=FastJSONResponse)
+def search_expenses(
+    q: str,
+    category: Optional[str] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limit: int = 20,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Clear all expenses for current user"""
-    db.query(Expense).filter(Expense.user_id == current_user.id).delete()
-    db.commit()
-    return {"message": "All expenses cleared successfully"}
+    """Fuzzy/word search over expense titles, ranked and cursor-paginated"""
+    q = q.strip()
+    if not q:
+        raise HTTPException(status_code=400, detail="Search query must not be empty")
+    category = _filter_category(category)
+    limit = max(1, min(limit, 100))
+
+    items, next_cursor = expense_crud.search_expenses(
+        db,
+        current_user.id,
+        q,
+        category=category,
+        start=datetime.combine(start, time.min) if start else None,
+        end=datetime.combine(end + timedelta(days=1), time.min) if end else None,
+        cursor=_decode_cursor(cursor) if cursor else None,
+        limit=limit
+    )
+    return FastJSONResponse({
+        "items": amounts_from_minor_units(items),
+        "next_cursor": _encode_cursor(next_cursor)
+    })
 
 # Settings routes (must come before dynamic routes)
 @router.get("/settings", response_model=Settings)
@@ -91,40 +322,118 @@ def update_settings(settings: Settings):
     return settings
 
 # Reports routes (must come before dynamic routes)
+def _set_report_source(response: Response, view_age: Optional[float]):
+    """Tell clients whether a report came from the materialized view and how old it is"""
+    if view_age is None:
+        response.headers["X-Report-Source"] = "live"
+    else:
+        response.headers["X-Report-Source"] = "materialized"
+        response.headers["X-Report-Age"] = str(int(view_age))
+
 @router.get("/reports/categories", response_model=List[Dict[str, Any]])
 def get_category_report(
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get expense report grouped by category for current user"""
-    return expense_crud.get_category_report(db, current_user.id)
+    view_age = report_views.fresh_view_age(db)
+    _set_report_source(response, view_age)
+    if view_age is not None:
+        report = expense_crud.get_category_report_from_view(db, current_user.id)
+    else:
+        report = expense_crud.get_category_report(db, current_user.id)
+    return amounts_from_minor_units(report)
 
 @router.get("/reports/monthly", response_model=List[Dict[str, Any]])
 def get_monthly_report(
+    response: Response,
     months: int = 6, 
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get monthly expense report for the last N months for current user"""
-    return expense_crud.get_monthly_report(db, current_user.id, months)
+    view_age = report_views.fresh_view_age(db)
+    _set_report_source(response, view_age)
+    if view_age is not None:
+        report = expense_crud.get_monthly_report_from_view(db, current_user.id, months)
+    else:
+        report = expense_crud.get_monthly_report(db, current_user.id, months)
+    return amounts_from_minor_units(report)
 
 @router.get("/reports/summary", response_model=Dict[str, Any])
 def get_summary_report(
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get summary statistics for current user"""
-    total_amount = expense_crud.get_total_expenses(db, current_user.id)
-    total_count = expense_crud.get_expenses_count(db, current_user.id)
-    category_report = expense_crud.get_category_report(db, current_user.id)
+    view_age = report_views.fresh_view_age(db)
+    _set_report_source(response, view_age)
+    if view_age is not None:
+        category_report = expense_crud.get_category_report_from_view(db, current_user.id)
+        total_amount = sum(row["total_amount_minor"] for row in category_report)
+        total_count = sum(row["count"] for row in category_report)
+    else:
+        total_amount = expense_crud.get_total_expenses(db, current_user.id)
+        total_count = expense_crud.get_expenses_count(db, current_user.id)
+        category_report = expense_crud.get_category_report(db, current_user.id)
 
     return {
-        "total_amount": total_amount,
+        "total_amount": from_minor_units(total_amount),
         "total_count": total_count,
-        "average_amount": round(total_amount / total_count, 2) if total_count > 0 else 0,
-        "categories": category_report
+        "average_amount": from_minor_units(round(total_amount / total_count)) if total_count > 0 else 0,
+        "categories": amounts_from_minor_units(category_report)
     }
 
+# Default range (days) per analytics granularity
+ANALYTICS_DEFAULT_DAYS = {"day": 30, "week": 84, "month": 365, "year": 1825}
+MAX_ANALYTICS_BUCKETS = 1000
+
+def _analytics_bucket_count(granularity: str, start: date, end: date) -> int:
+    """Buckets the report will have: calendar units touched, as date_trunc counts them"""
+    if granularity == "day":
+        return (end - start).days + 1
+    if granularity == "week":
+        # date_trunc('week') starts weeks on Monday
+        return ((end - timedelta(days=end.weekday())) - (start - timedelta(days=start.weekday()))).days // 7 + 1
+    if granularity == "month":
+        return (end.year - start.year) * 12 + end.month - start.month + 1
+    return end.year - start.year + 1
+
+@router.get("/reports/analytics", response_model=AnalyticsReport)
+def get_analytics_report(
+    granularity: str = "month",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    category: Optional[str] = None,
+    compare: bool = True,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get zero-filled expense totals per day/week/month/year for a date range"""
+    if granularity not in expense_crud.ANALYTICS_GRANULARITIES:
+        raise HTTPException(status_code=400, detail="Invalid granularity")
+    category = _filter_category(category)
+
+    end = end or datetime.now().date()
+    start = start or end - timedelta(days=ANALYTICS_DEFAULT_DAYS[granularity])
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if _analytics_bucket_count(granularity, start, end) > MAX_ANALYTICS_BUCKETS:
+        raise HTTPException(status_code=400, detail="Date range has too many buckets for this granularity")
+
+    report = expense_crud.get_analytics_report(
+        db,
+        current_user.id,
+        granularity,
+        datetime.combine(start, time.min),
+        datetime.combine(end, time.min),
+        category=category,
+        compare=compare
+    )
+    return amounts_from_minor_units(report)
+
 # Dynamic routes (must come after static routes)
 @router.get("/{expense_id}", response_model=ExpenseResponse)
 def read_expense(
@@ -135,27 +444,43 @@ def read_expense(
     expense = expense_crud.get_expense_by_id(db, expense_id, current_user.id)
     if expense is None:
         raise HTTPException(status_code=404, detail="Expense not found")
-    return expense
+    return _expense_response(expense)
 
 @router.put("/{expense_id}", response_model=ExpenseResponse)
 def update_expense_route(
     expense_id: int, 
     updated_data: ExpenseUpdate, 
+    request: Request,
+    idempotency_key: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    updated = expense_crud.update_expense(db, expense_id, updated_data, current_user.id)
-    if updated is None:
-        raise HTTPException(status_code=404, detail="Expense not found")
-    return updated
+    def handler():
+        updated = expense_crud.update_expense(db, expense_id, updated_data, current_user.id)
+        if updated is None:
+            raise HTTPException(status_code=404, detail="Expense not found")
+        return _expense_response(updated)
+
+    return idempotency.run_idempotent(
+        db, current_user.id, idempotency_key,
+        idempotency.request_fingerprint(request, updated_data.model_dump_json(exclude_unset=True)),
+        handler
+    )
 
 @router.delete("/{expense_id}", response_model=ExpenseResponse)
 def delete_expense_route(
     expense_id: int, 
+    request: Request,
+    idempotency_key: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    deleted = expense_crud.delete_expense(db, expense_id, current_user.id)
-    if deleted is None:
-        raise HTTPException(status_code=404, detail="Expense not found")
-    return deleted
\ No newline at end of file
+    def handler():
+        deleted = expense_crud.delete_expense(db, expense_id, current_user.id)
+        if deleted is None:
+            raise HTTPException(status_code=404, detail="Expense not found")
+        return _expense_response(deleted)
+
+    return idempotency.run_idempotent(
+        db, current_user.id, idempotency_key, idempotency.request_fingerprint(request), handler
+    )
\ No newline at end of file
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from db.database import get_db
-from core.auth import get_current_user, get_or_create_user_settings
+from core.auth import get_current_user, get_or_create_user_settings, get_cached_user_settings, settings_values
+from core import settings_cache
 from models.user_model import User
 from models.user_settings_model import UserSettings
 from pydantic import BaseModel
@@ -23,11 +24,7 @@ def get_user_settings(
     db: Session = Depends(get_db)
 ):
     """Get current user settings"""
-    settings = get_or_create_user_settings(db, current_user.id)
-    return UserSettingsResponse(
-        theme=settings.theme,
-        currency=settings.currency
-    )
+    return UserSettingsResponse(**get_cached_user_settings(db, current_user.id))
 
 @router.put("", response_model=UserSettingsResponse)
 def update_user_settings(
@@ -42,9 +39,12 @@ def update_user_settings(
         settings.theme = settings_data.theme
     if settings_data.currency is not None:
         settings.currency = settings_data.currency
-    
+
+    # Other replicas drop their cached copy once this commits
+    settings_cache.notify_invalidation(db, current_user.id)
     db.commit()
     db.refresh(settings)
+    settings_cache.put(current_user.id, settings_values(settings))
     
     return UserSettingsResponse(
         theme=settings.theme,
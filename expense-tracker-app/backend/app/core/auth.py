@@ -6,7 +6,10 @@ from sqlalchemy.orm import Session
 from db.database import get_db
 from models.user_model import User
 from models.user_settings_model import UserSettings
+from core.tracing import start_span, inject_headers
+from core import settings_cache
 from datetime import datetime, timedelta
+from typing import Dict
 import os
 
 # Google OAuth configuration
@@ -15,15 +18,21 @@ JWT_SECRET = os.getenv("JWT_SECRET")
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24
 
+# Comma-separated emails allowed to use admin endpoints
+ADMIN_EMAILS = {email.strip() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()}
+
 security = HTTPBearer()
 
 def verify_google_token(token: str) -> dict:
     """Verify Google ID token and return user info"""
     try:
         # Verify the token with Google
-        response = requests.get(
-            f"https://oauth2.googleapis.com/tokeninfo?id_token={token}"
-        )
+        with start_span("GET oauth2.googleapis.com/tokeninfo", **{"span.kind": "client"}) as span:
+            response = requests.get(
+                f"https://oauth2.googleapis.com/tokeninfo?id_token={token}",
+                headers=inject_headers()
+            )
+            span.set_attribute("http.status_code", response.status_code)
         if response.status_code != 200:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -93,6 +102,15 @@ def get_current_user(
 
     return user
 
+def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
+    """Get current user, requiring them to be listed in ADMIN_EMAILS"""
+    if current_user.email not in ADMIN_EMAILS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return current_user
+
 def get_or_create_user_settings(db: Session, user_id: int) -> UserSettings:
     """Get or create user settings"""
     settings = db.query(UserSettings).filter(UserSettings.user_id == user_id).first()
@@ -101,4 +119,13 @@ def get_or_create_user_settings(db: Session, user_id: int) -> UserSettings:
         db.add(settings)
         db.commit()
         db.refresh(settings)
-    return settings
\ No newline at end of file
+    return settings
+
+def settings_values(settings: UserSettings) -> Dict[str, str]:
+    return {"theme": settings.theme, "currency": settings.currency}
+
+def get_cached_user_settings(db: Session, user_id: int) -> Dict[str, str]:
+    """Theme and currency for display, read through the settings cache (created on first miss)"""
+    return settings_cache.get_or_load(
+        user_id, lambda: settings_values(get_or_create_user_settings(db, user_id))
+    )
@@ -0,0 +1,56 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+# Threads for one-off jobs handed off by requests (bulk deletes, view refreshes)
+BACKGROUND_WORKERS = int(os.getenv("BACKGROUND_WORKERS", "2"))
+
+# In-process periodic jobs started from the application lifespan
+_tasks = []
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def start_periodic(name, interval_seconds, fn):
+    """Run a blocking function every interval_seconds on a worker thread"""
+    async def loop():
+        while True:
+            try:
+                await asyncio.to_thread(fn)
+            except Exception as e:
+                print(f"❌ Background task '{name}' failed:", e)
+            await asyncio.sleep(interval_seconds)
+
+    _tasks.append(asyncio.create_task(loop(), name=name))
+
+def submit(name, fn, *args):
+    """Run a blocking one-off job on the background executor.
+
+    The job runs outside any request, so it holds no in-flight slot, request
+    thread or trace span. Jobs still queued at shutdown are dropped; the
+    periodic resume tasks pick up anything they leave unfinished.
+    """
+    global _executor
+    def run():
+        try:
+            fn(*args)
+        except Exception as e:
+            print(f"❌ Background job '{name}' failed:", e)
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=BACKGROUND_WORKERS, thread_name_prefix="background")
+        _executor.submit(run)
+
+async def stop_all():
+    """Cancel all periodic jobs and drop queued one-off jobs"""
+    global _executor
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,121 @@
+import os
+import time
+from datetime import datetime
+from sqlalchemy import text, update, select, func, and_, or_
+from sqlalchemy.orm import Session
+from db.database import engine
+from models.user_model import User
+from models.bulk_delete_job_model import BulkDeleteJob
+from core.change_feed import notify_change
+
+# Background deletion of a user's expenses in short, throttled batches
+BULK_DELETE_BATCH_SIZE = int(os.getenv("BULK_DELETE_BATCH_SIZE", "1000"))
+BULK_DELETE_PAUSE_SECONDS = float(os.getenv("BULK_DELETE_PAUSE_SECONDS", "0.05"))
+BULK_DELETE_RESUME_SECONDS = int(os.getenv("BULK_DELETE_RESUME_SECONDS", "60"))
+BULK_DELETE_MAX_ATTEMPTS = int(os.getenv("BULK_DELETE_MAX_ATTEMPTS", "5"))
+BULK_DELETE_RETRY_BACKOFF_SECONDS = int(os.getenv("BULK_DELETE_RETRY_BACKOFF_SECONDS", "60"))
+BULK_DELETE_RETRY_BACKOFF_MAX_SECONDS = int(os.getenv("BULK_DELETE_RETRY_BACKOFF_MAX_SECONDS", "3600"))
+
+# Advisory lock namespace; the second key is the job id
+JOB_LOCK_NAMESPACE = 726034
+
+def start_bulk_delete(db: Session, user_id: int) -> BulkDeleteJob:
+    """Hide all of a user's current expenses at once and queue their deletion.
+
+    Runs in the caller's transaction; the job is picked up once it commits.
+    """
+    generation = db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(expense_generation=User.expense_generation + 1)
+        .returning(User.expense_generation)
+    ).scalar()
+    job = BulkDeleteJob(user_id=user_id, generation=generation, status="pending")
+    db.add(job)
+    notify_change(db, user_id, "reset")
+    db.flush()
+    return job
+
+def get_job(db: Session, job_id: int, user_id: int):
+    return db.query(BulkDeleteJob).filter(BulkDeleteJob.id == job_id, BulkDeleteJob.user_id == user_id).first()
+
+def _set_job(conn, job_id: int, **values):
+    conn.execute(
+        update(BulkDeleteJob).where(BulkDeleteJob.id == job_id).values(updated_at=datetime.now(), **values)
+    )
+    conn.commit()
+
+def run_bulk_delete_job(job_id: int) -> bool:
+    """Delete a job's expenses batch by batch, one short transaction per batch.
+
+    Returns False if another worker holds the job's lock.
+    """
+    with engine.connect() as conn:
+        locked = conn.execute(
+            select(func.pg_try_advisory_lock(JOB_LOCK_NAMESPACE, job_id))
+        ).scalar()
+        conn.commit()
+        if not locked:
+            return False
+
+        try:
+            job = conn.execute(select(BulkDeleteJob).where(BulkDeleteJob.id == job_id)).first()
+            if job is None or job.status == "completed":
+                return True
+            _set_job(conn, job_id, status="running", error=None, attempts=BulkDeleteJob.attempts + 1)
+
+            while True:
+                deleted = conn.execute(text("""
+                    DELETE FROM expenses WHERE id IN (
+                        SELECT id FROM expenses
+                        WHERE user_id = :user_id AND generation < :generation
+                        LIMIT :batch_size
+                    )
+                """), {
+                    "user_id": job.user_id,
+                    "generation": job.generation,
+                    "batch_size": BULK_DELETE_BATCH_SIZE,
+                }).rowcount
+                _set_job(conn, job_id, deleted_count=BulkDeleteJob.deleted_count + deleted)
+                if deleted < BULK_DELETE_BATCH_SIZE:
+                    break
+                time.sleep(BULK_DELETE_PAUSE_SECONDS)
+
+            _set_job(conn, job_id, status="completed", completed_at=datetime.now())
+            return True
+        except Exception as e:
+            conn.rollback()
+            attempts = job.attempts + 1
+            if attempts >= BULK_DELETE_MAX_ATTEMPTS:
+                print(f"❌ Bulk delete job {job_id} failed for good after {attempts} attempts:", e)
+            else:
+                print(f"❌ Bulk delete job {job_id} failed (attempt {attempts}/{BULK_DELETE_MAX_ATTEMPTS}):", e)
+            _set_job(conn, job_id, status="failed", error=str(e))
+            return True
+        finally:
+            conn.execute(select(func.pg_advisory_unlock(JOB_LOCK_NAMESPACE, job_id)))
+            conn.commit()
+
+def _retry_due():
+    # Failed jobs wait BULK_DELETE_RETRY_BACKOFF_SECONDS, doubling per attempt
+    # up to the max, and are left failed after BULK_DELETE_MAX_ATTEMPTS
+    backoff = func.least(
+        BULK_DELETE_RETRY_BACKOFF_SECONDS * func.power(2, func.greatest(BulkDeleteJob.attempts - 1, 0)),
+        BULK_DELETE_RETRY_BACKOFF_MAX_SECONDS
+    )
+    return and_(
+        BulkDeleteJob.status == "failed",
+        BulkDeleteJob.attempts < BULK_DELETE_MAX_ATTEMPTS,
+        BulkDeleteJob.updated_at + func.make_interval(0, 0, 0, 0, 0, 0, backoff) <= datetime.now()
+    )
+
+def resume_pending_jobs():
+    """Pick up jobs left unfinished by a restarted or crashed pod, and retry failed ones"""
+    with engine.connect() as conn:
+        job_ids = conn.execute(
+            select(BulkDeleteJob.id)
+            .where(or_(BulkDeleteJob.status.in_(["pending", "running"]), _retry_due()))
+            .order_by(BulkDeleteJob.id)
+        ).scalars().all()
+    for job_id in job_ids:
+        run_bulk_delete_job(job_id)
@@ -1,4 +1,6 @@
 # Global category configuration for consistent category handling across the application
+import random
+from types import MappingProxyType
 
 CATEGORIES = {
     "Food": [
@@ -62,20 +64,35 @@ CATEGORIES = {
     ]
 }
 
+# Precomputed once at import; read-only so request paths can share them
+CATEGORY_NAMES = tuple(CATEGORIES)
+CATEGORY_TITLES = MappingProxyType({category: tuple(titles) for category, titles in CATEGORIES.items()})
+_CANONICAL_NAMES = MappingProxyType({category.lower(): category for category in CATEGORIES})
+
 def get_available_categories():
-    """Get list of all available categories"""
-    return list(CATEGORIES.keys())
+    """Get all available categories"""
+    return CATEGORY_NAMES
 
 def get_category_titles(category):
-    """Get list of titles for a specific category"""
-    return CATEGORIES.get(category, [])
+    """Get the titles for a specific category"""
+    return CATEGORY_TITLES.get(category, ())
 
 def is_valid_category(category):
     """Check if a category is valid"""
-    return category in CATEGORIES
+    return category in CATEGORY_TITLES
+
+def normalize_category(category: str) -> str:
+    """Canonical category name, ignoring case and surrounding whitespace.
+
+    Raises ValueError for unknown categories, so pydantic validators reject
+    them before any database work.
+    """
+    canonical = _CANONICAL_NAMES.get(category.strip().lower()) if isinstance(category, str) else None
+    if canonical is None:
+        raise ValueError(f"Invalid category; expected one of: {', '.join(CATEGORY_NAMES)}")
+    return canonical
 
 def get_random_title_for_category(category):
     """Get a random title for a specific category"""
-    import random
     titles = get_category_titles(category)
-    return random.choice(titles) if titles else "Miscellaneous" 
\ No newline at end of file
+    return random.choice(titles) if titles else "Miscellaneous"
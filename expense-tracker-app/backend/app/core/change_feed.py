@@ -0,0 +1,253 @@
+import asyncio
+import hashlib
+import os
+import secrets
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Set
+import orjson
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from db.database import engine
+
+# Per-user expense change feed: write paths NOTIFY, every replica LISTENs
+CHANGE_FEED_ENABLED = os.getenv("CHANGE_FEED_ENABLED", "true").lower() == "true"
+CHANGE_FEED_CHANNEL = "expense_changes"
+CHANGE_FEED_HISTORY = int(os.getenv("CHANGE_FEED_HISTORY", "100"))
+CHANGE_FEED_HISTORY_USERS = int(os.getenv("CHANGE_FEED_HISTORY_USERS", "10000"))
+CHANGE_FEED_BUFFER = int(os.getenv("CHANGE_FEED_BUFFER", "100"))
+CHANGE_FEED_HEARTBEAT_SECONDS = int(os.getenv("CHANGE_FEED_HEARTBEAT_SECONDS", "15"))
+CHANGE_FEED_RECONNECT_SECONDS = 2
+CHANGE_FEED_TICKET_SECONDS = int(os.getenv("CHANGE_FEED_TICKET_SECONDS", "30"))
+
+# Queued to a subscriber when it has to re-fetch everything
+RESYNC = {"type": "resync"}
+
+def notify_change(db: Session, user_id: int, event_type: str, expense_id: Optional[int] = None):
+    """Queue a change event in the caller's transaction; it is sent on commit.
+
+    The payload only carries ids, so it stays far below the 8000-byte NOTIFY
+    limit whatever the row holds; subscribers load created/updated rows with
+    load_expense_rows().
+    """
+    db.execute(
+        text("""
+            SELECT pg_notify(:channel, json_build_object(
+                'id', nextval('expense_change_seq'),
+                'user_id', :user_id,
+                'type', :event_type,
+                'expense_id', :expense_id
+            )::text)
+        """),
+        {"channel": CHANGE_FEED_CHANNEL, "user_id": user_id, "event_type": event_type, "expense_id": expense_id}
+    )
+
+def load_expense_rows(user_id: int, expense_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    """Current rows (amount in minor units) for a batch of events, by id"""
+    if not expense_ids:
+        return {}
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text("""
+                SELECT id, title, amount_minor, category, date, created_at
+                FROM expenses WHERE id = ANY(:expense_ids) AND user_id = :user_id
+            """),
+            {"expense_ids": expense_ids, "user_id": user_id}
+        ).mappings().all()
+    return {row["id"]: dict(row) for row in rows}
+
+def _ticket_hash(ticket: str) -> str:
+    return hashlib.sha256(ticket.encode()).hexdigest()
+
+def issue_ticket(db: Session, user_id: int) -> str:
+    """Single-use credential for opening the stream, valid CHANGE_FEED_TICKET_SECONDS.
+
+    EventSource cannot send headers, and a JWT in the URL would end up in
+    proxy access logs; a spent or expired ticket is worthless there. Only
+    its hash is stored, in the database so any replica can redeem it.
+    """
+    ticket = secrets.token_urlsafe(32)
+    now = datetime.now()
+    db.execute(text("DELETE FROM stream_tickets WHERE expires_at < :now"), {"now": now})
+    db.execute(
+        text("INSERT INTO stream_tickets (ticket_hash, user_id, expires_at) VALUES (:ticket_hash, :user_id, :expires_at)"),
+        {"ticket_hash": _ticket_hash(ticket), "user_id": user_id, "expires_at": now + timedelta(seconds=CHANGE_FEED_TICKET_SECONDS)}
+    )
+    db.commit()
+    return ticket
+
+def peek_ticket(ticket: str) -> Optional[int]:
+    """User id of a valid ticket without consuming it (for rate limiting)"""
+    with engine.connect() as conn:
+        return conn.execute(
+            text("SELECT user_id FROM stream_tickets WHERE ticket_hash = :ticket_hash AND expires_at > :now"),
+            {"ticket_hash": _ticket_hash(ticket), "now": datetime.now()}
+        ).scalar()
+
+def redeem_ticket(ticket: str) -> Optional[int]:
+    """User id of a valid ticket, consuming it; None if unknown, spent or expired"""
+    with engine.begin() as conn:
+        return conn.execute(
+            text("DELETE FROM stream_tickets WHERE ticket_hash = :ticket_hash AND expires_at > :now RETURNING user_id"),
+            {"ticket_hash": _ticket_hash(ticket), "now": datetime.now()}
+        ).scalar()
+
+class Subscription:
+    """One connected client: a bounded queue of events for one user"""
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=CHANGE_FEED_BUFFER)
+
+    def push(self, event: dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow consumer: drop its backlog and make it re-fetch instead
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+class ChangeFeedHub:
+    """Fans out NOTIFY events from one LISTEN connection to local subscribers.
+
+    The connection is watched with loop.add_reader, so idle subscribers cost
+    a queue each and no threads. Recent events are kept per user so a client
+    reconnecting with Last-Event-ID gets what it missed, or a resync when
+    that event is no longer known here. Other modules can share the
+    connection for their own channels via listen().
+    """
+
+    def __init__(self):
+        self._conn = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._history: "OrderedDict[int, deque]" = OrderedDict()
+        self._channels: Dict[str, Callable[[str], None]] = {}
+        self._gap_handlers: List[Callable[[], None]] = []
+        self.running = False
+
+    def listen(self, channel: str, on_payload: Callable[[str], None], on_gap: Optional[Callable[[], None]] = None):
+        """Also deliver NOTIFYs on another channel, over the same connection.
+
+        Register before start(). on_gap runs when notifications may have been
+        missed: when the connection drops and again once it is back.
+        """
+        self._channels[channel] = on_payload
+        if on_gap:
+            self._gap_handlers.append(on_gap)
+
+    async def start(self):
+        if engine.dialect.name != "postgresql" or engine.dialect.driver != "psycopg2":
+            print("❌ Change feed needs PostgreSQL with psycopg2; disabled")
+            return
+        self._loop = asyncio.get_running_loop()
+        self.running = True
+        # Connect in the background so a database outage does not block startup
+        self._reconnect_task = self._loop.create_task(self._connect())
+
+    async def stop(self):
+        self.running = False
+        if self._reconnect_task:
+            self._reconnect_task.cancel()
+        self._close()
+
+    async def _connect(self):
+        while self.running:
+            try:
+                self._conn = await asyncio.to_thread(self._listen)
+                self._loop.add_reader(self._conn.fileno(), self._on_readable)
+                self._run_gap_handlers()
+                print("✅ Change feed listening")
+                return
+            except Exception as e:
+                print("❌ Change feed connection failed:", e)
+                await asyncio.sleep(CHANGE_FEED_RECONNECT_SECONDS)
+
+    def _listen(self):
+        conn = engine.raw_connection()
+        dbapi_conn = conn.driver_connection
+        conn.detach()
+        dbapi_conn.autocommit = True
+        with dbapi_conn.cursor() as cursor:
+            cursor.execute(f"LISTEN {CHANGE_FEED_CHANNEL}")
+            for channel in self._channels:
+                cursor.execute(f"LISTEN {channel}")
+        return dbapi_conn
+
+    def _run_gap_handlers(self):
+        for on_gap in self._gap_handlers:
+            try:
+                on_gap()
+            except Exception as e:
+                print("❌ Change feed gap handler failed:", e)
+
+    def _close(self):
+        if self._conn is None:
+            return
+        try:
+            self._loop.remove_reader(self._conn.fileno())
+            self._conn.close()
+        except Exception:
+            pass
+        self._conn = None
+
+    def _on_readable(self):
+        try:
+            self._conn.poll()
+        except Exception as e:
+            print("❌ Change feed connection lost:", e)
+            self._close()
+            # Events may have been missed: forget history and resync everyone
+            self._history.clear()
+            for subscriptions in self._subscribers.values():
+                for subscription in subscriptions:
+                    subscription.push(RESYNC)
+            self._run_gap_handlers()
+            self._reconnect_task = self._loop.create_task(self._connect())
+            return
+        while self._conn.notifies:
+            notify = self._conn.notifies.pop(0)
+            if notify.channel == CHANGE_FEED_CHANNEL:
+                self.dispatch(orjson.loads(notify.payload))
+            elif notify.channel in self._channels:
+                try:
+                    self._channels[notify.channel](notify.payload)
+                except Exception as e:
+                    print(f"❌ {notify.channel} handler failed:", e)
+
+    def dispatch(self, event: dict):
+        user_id = event["user_id"]
+        history = self._history.pop(user_id, None)
+        if history is None:
+            history = deque(maxlen=CHANGE_FEED_HISTORY)
+        history.append(event)
+        self._history[user_id] = history
+        if len(self._history) > CHANGE_FEED_HISTORY_USERS:
+            self._history.popitem(last=False)
+
+        for subscription in self._subscribers.get(user_id, ()):
+            subscription.push(event)
+
+    def subscribe(self, user_id: int, last_event_id: Optional[int] = None) -> Subscription:
+        subscription = Subscription(user_id)
+        if last_event_id is not None:
+            history = list(self._history.get(user_id, ()))
+            ids = [event["id"] for event in history]
+            if last_event_id in ids:
+                for event in history[ids.index(last_event_id) + 1:]:
+                    subscription.push(event)
+            else:
+                subscription.push(RESYNC)
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscriptions = self._subscribers.get(subscription.user_id)
+        if subscriptions:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscribers[subscription.user_id]
+
+hub = ChangeFeedHub()
@@ -0,0 +1,145 @@
+import gzip
+import os
+from prometheus_client import Counter
+
+# Optional encoders; gzip is always available
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+
+# Paths whose bodies are already compressed (proxied images)
+COMPRESSION_EXCLUDED_PATHS = ("/api/auth/proxy-image",)
+
+# Content types that do not benefit from compression or must not be buffered
+UNCOMPRESSIBLE_CONTENT_TYPES = ("image/", "video/", "audio/", "application/zip", "application/gzip", "text/event-stream")
+
+RESPONSE_BODY_BYTES = Counter(
+    "http_response_body_bytes_total",
+    "Response body bytes before (uncompressed) and after (compressed) compression",
+    ["encoding", "stage"],
+)
+
+def _compress_gzip(body: bytes) -> bytes:
+    return gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL)
+
+def _compress_brotli(body: bytes) -> bytes:
+    return brotli.compress(body, quality=5)
+
+def _compress_zstd(body: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=3).compress(body)
+
+# Server preference order; an encoder is offered only if its module is installed
+ENCODERS = [
+    (name, fn)
+    for name, fn, available in (
+        ("zstd", _compress_zstd, zstandard is not None),
+        ("br", _compress_brotli, brotli is not None),
+        ("gzip", _compress_gzip, True),
+    )
+    if available
+]
+
+def negotiate_encoding(accept_encoding: str):
+    """Pick the preferred supported encoding allowed by an Accept-Encoding header"""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[token.strip().lower()] = quality
+
+    for name, fn in ENCODERS:
+        if accepted.get(name, accepted.get("*", 0.0)) > 0:
+            return name, fn
+    return None
+
+class CompressionMiddleware:
+    """Negotiated gzip/br/zstd compression of buffered response bodies.
+
+    Responses smaller than the minimum size, already encoded, uncompressible,
+    streamed in several chunks or on excluded paths are sent unchanged.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(COMPRESSION_EXCLUDED_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        encoder = negotiate_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoder is None:
+            await self.app(scope, receive, send)
+            return
+
+        encoding, compress = encoder
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+
+            if message["type"] == "http.response.start":
+                response_headers = {k.lower(): v for k, v in message.get("headers", [])}
+                content_type = response_headers.get(b"content-type", b"").decode("latin-1")
+                if b"content-encoding" in response_headers or content_type.startswith(UNCOMPRESSIBLE_CONTENT_TYPES):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message
+                return
+
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            if message.get("more_body", False) or start_message is None:
+                # Streaming response: send the rest unchanged
+                passthrough = True
+                if start_message is not None:
+                    await send(start_message)
+                    start_message = None
+                await send(message)
+                return
+
+            if len(body) < self.minimum_size:
+                await send(start_message)
+                await send(message)
+                return
+
+            compressed = compress(body)
+            RESPONSE_BODY_BYTES.labels(encoding, "uncompressed").inc(len(body))
+            RESPONSE_BODY_BYTES.labels(encoding, "compressed").inc(len(compressed))
+
+            vary = [v for k, v in start_message.get("headers", []) if k.lower() == b"vary"]
+            new_headers = [
+                (k, v) for k, v in start_message.get("headers", [])
+                if k.lower() not in (b"content-length", b"vary")
+            ]
+            new_headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(compressed)).encode()),
+                (b"vary", b", ".join(vary + [b"Accept-Encoding"])),
+            ]
+            await send({**start_message, "headers": new_headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,112 @@
+import hashlib
+import os
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import text, select, func
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from db.database import engine
+from models.idempotency_key_model import IdempotencyKey
+
+# Idempotency-Key support for mutating expense routes
+IDEMPOTENCY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+IDEMPOTENCY_LOCK_TIMEOUT_MS = int(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT_MS", "10000"))
+IDEMPOTENCY_CLEANUP_SECONDS = int(os.getenv("IDEMPOTENCY_CLEANUP_SECONDS", "300"))
+IDEMPOTENCY_CLEANUP_BATCH_SIZE = 1000
+MAX_KEY_LENGTH = 255
+
+# Advisory lock namespace; the second key is hashtext(user_id:key)
+KEY_LOCK_NAMESPACE = 726035
+
+def request_fingerprint(request: Request, payload: str = "") -> str:
+    """Hash of the request a key was first used with"""
+    return hashlib.sha256(
+        f"{request.method} {request.url.path}?{request.url.query}\n{payload}".encode()
+    ).hexdigest()
+
+def _replay(record: IdempotencyKey) -> Response:
+    return Response(
+        content=record.response_body,
+        status_code=record.status_code,
+        media_type="application/json",
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+def run_idempotent(
+    db: Session,
+    user_id: int,
+    key: Optional[str],
+    request_hash: str,
+    handler: Callable[[], Response]
+) -> Response:
+    """Run handler once per (user, key) and replay its stored response afterwards.
+
+    handler writes through db without committing. Its changes and the stored
+    response commit together, so a key never ends up without its record.
+    Concurrent requests with the same key wait on an advisory lock held by
+    that same transaction, so only one of them runs the handler; the rest
+    replay its response. Only 2xx responses are stored; errors may be
+    retried with the same key.
+    """
+    if key is None:
+        response = handler()
+        db.commit()
+        return response
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail="Invalid Idempotency-Key")
+
+    try:
+        # Transaction-level lock on the request's own session: released by its commit
+        db.execute(text(f"SET LOCAL lock_timeout = {IDEMPOTENCY_LOCK_TIMEOUT_MS}"))
+        db.execute(select(func.pg_advisory_xact_lock(
+            KEY_LOCK_NAMESPACE, func.hashtext(f"{user_id}:{key}")
+        )))
+        db.execute(text("SET LOCAL lock_timeout TO DEFAULT"))
+    except OperationalError:
+        db.rollback()
+        raise HTTPException(
+            status_code=409,
+            detail="A request with this Idempotency-Key is in progress",
+            headers={"Retry-After": "1"},
+        )
+
+    record = db.query(IdempotencyKey).filter(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.key == key,
+        IdempotencyKey.expires_at > datetime.now()
+    ).first()
+    if record is not None:
+        if record.request_hash != request_hash:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was used with a different request")
+        response = _replay(record)
+        db.rollback()
+        return response
+
+    response = handler()
+    if 200 <= response.status_code < 300:
+        db.merge(IdempotencyKey(
+            user_id=user_id,
+            key=key,
+            request_hash=request_hash,
+            status_code=response.status_code,
+            response_body=bytes(response.body),
+            expires_at=datetime.now() + timedelta(hours=IDEMPOTENCY_TTL_HOURS),
+        ))
+    db.commit()
+    return response
+
+def cleanup_expired_keys() -> int:
+    """Delete expired keys in small batches to keep each transaction short"""
+    total = 0
+    with engine.connect() as conn:
+        while True:
+            deleted = conn.execute(text("""
+                DELETE FROM idempotency_keys WHERE ctid IN (
+                    SELECT ctid FROM idempotency_keys WHERE expires_at < :now LIMIT :batch_size
+                )
+            """), {"now": datetime.now(), "batch_size": IDEMPOTENCY_CLEANUP_BATCH_SIZE}).rowcount
+            conn.commit()
+            total += deleted
+            if deleted < IDEMPOTENCY_CLEANUP_BATCH_SIZE:
+                return total
@@ -1,4 +1,29 @@
+import os
+import random
 import subprocess
+import time
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+# Lock-aware Alembic runs: one replica migrates while the others wait, and
+# DDL gives up quickly (then retries) instead of queueing behind live traffic
+MIGRATION_LOCK_TIMEOUT_MS = int(os.getenv("MIGRATION_LOCK_TIMEOUT_MS", "500"))
+MIGRATION_STATEMENT_TIMEOUT_MS = int(os.getenv("MIGRATION_STATEMENT_TIMEOUT_MS", "300000"))
+MIGRATION_LOCK_RETRIES = int(os.getenv("MIGRATION_LOCK_RETRIES", "30"))
+MIGRATION_RETRY_BACKOFF_SECONDS = float(os.getenv("MIGRATION_RETRY_BACKOFF_SECONDS", "2"))
+MIGRATION_RETRY_BACKOFF_MAX_SECONDS = 30
+# Stop retrying after this long, so a failed run surfaces before the startup
+# probe in manifests/expense-tracker/backend.yaml (60 x 5s) kills the pod
+MIGRATION_RETRY_BUDGET_SECONDS = float(os.getenv("MIGRATION_RETRY_BUDGET_SECONDS", "240"))
+# CONCURRENTLY builds and VALIDATE take locks that do not block reads or
+# writes, but wait for older transactions; 500 ms would fail them needlessly
+MIGRATION_CONCURRENT_LOCK_TIMEOUT_MS = int(os.getenv("MIGRATION_CONCURRENT_LOCK_TIMEOUT_MS", "60000"))
+
+# Advisory lock held by the replica running migrations
+MIGRATION_LOCK_KEY = 726038
+
+# SQLSTATE for lock_timeout expiry
+LOCK_NOT_AVAILABLE = "55P03"
 
 def run_migrations():
     try:
@@ -6,4 +31,63 @@ def run_migrations():
         subprocess.run(["alembic", "upgrade", "head"], check=True)
         print("✅ Alembic migrations applied.")
     except subprocess.CalledProcessError as e:
-        print("❌ Migration failed:", e)
\ No newline at end of file
+        print("❌ Migration failed:", e)
+
+def acquire_leader_lock(connection):
+    """Block until this process is the only one migrating.
+
+    Followers wait here and then find the schema already at head.
+    """
+    locked = connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY}).scalar()
+    if not locked:
+        print("⏳ Another replica is running migrations; waiting...")
+        connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+    connection.commit()
+
+def release_leader_lock(connection):
+    connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+    connection.commit()
+
+def set_session_timeouts(connection):
+    """Session-wide guards for every migration statement"""
+    connection.execute(text(f"SET lock_timeout = {MIGRATION_LOCK_TIMEOUT_MS}"))
+    connection.execute(text(f"SET statement_timeout = {MIGRATION_STATEMENT_TIMEOUT_MS}"))
+    connection.commit()
+
+def is_lock_timeout(error: Exception) -> bool:
+    orig = getattr(error, "orig", None)
+    return (getattr(orig, "pgcode", None) or getattr(orig, "sqlstate", None)) == LOCK_NOT_AVAILABLE
+
+def run_with_lock_retries(run):
+    """Run pending migrations, retrying the failed step after a lock timeout.
+
+    Needs transaction_per_migration so applied steps stay applied.
+    """
+    deadline = time.monotonic() + MIGRATION_RETRY_BUDGET_SECONDS
+    for attempt in range(1, MIGRATION_LOCK_RETRIES + 1):
+        try:
+            run()
+            return
+        except DBAPIError as e:
+            if not is_lock_timeout(e) or attempt == MIGRATION_LOCK_RETRIES:
+                raise
+            delay = min(MIGRATION_RETRY_BACKOFF_SECONDS * attempt, MIGRATION_RETRY_BACKOFF_MAX_SECONDS) * random.uniform(0.5, 1.5)
+            if time.monotonic() + delay > deadline:
+                print(f"❌ Migration retry budget ({MIGRATION_RETRY_BUDGET_SECONDS:.0f}s) spent after {attempt} attempts")
+                raise
+            print(f"⏳ Migration hit lock_timeout (attempt {attempt}/{MIGRATION_LOCK_RETRIES}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+def step_timer():
+    """on_version_apply callback printing how long each revision took"""
+    last = time.monotonic()
+
+    def on_version_apply(ctx, step, heads, run_args):
+        nonlocal last
+        now = time.monotonic()
+        if not step.is_stamp:
+            action = "Upgraded to" if step.is_upgrade else "Downgraded from"
+            print(f"✅ {action} {step.up_revision_id} ({step.up_revision.doc}) in {now - last:.2f}s")
+        last = now
+
+    return on_version_apply
@@ -0,0 +1,151 @@
+import time
+from contextlib import contextmanager
+from typing import List, Optional
+from alembic import op
+import sqlalchemy as sa
+from core.migrate import MIGRATION_CONCURRENT_LOCK_TIMEOUT_MS
+
+# Online schema change operations for use inside Alembic revisions. Plain
+# op.create_index/create_foreign_key/ALTER ... NOT NULL scan or rewrite
+# expenses while holding locks that block traffic; these do the slow part
+# outside the migration transaction or under weaker locks.
+#
+# Helpers that use an autocommit block commit everything the revision did
+# before them. A later lock timeout re-runs the whole revision, so every
+# step of such a revision must be safe to repeat (ADD COLUMN IF NOT EXISTS,
+# CREATE OR REPLACE, DROP ... IF EXISTS before CREATE); these helpers are.
+
+@contextmanager
+def no_statement_timeout():
+    """Lift the runner's statement_timeout for long non-blocking work"""
+    bind = op.get_bind()
+    previous = bind.execute(sa.text("SHOW statement_timeout")).scalar()
+    bind.execute(sa.text("SET statement_timeout = 0"))
+    try:
+        yield
+    finally:
+        bind.execute(sa.text(f"SET statement_timeout = '{previous}'"))
+
+@contextmanager
+def concurrent_lock_timeout():
+    """Longer lock_timeout for DDL whose locks do not block traffic.
+
+    CONCURRENTLY and VALIDATE wait for transactions already running on the
+    table; the runner's short lock_timeout is meant for DDL that queues
+    reads and writes behind it.
+    """
+    bind = op.get_bind()
+    previous = bind.execute(sa.text("SHOW lock_timeout")).scalar()
+    bind.execute(sa.text(f"SET lock_timeout = {MIGRATION_CONCURRENT_LOCK_TIMEOUT_MS}"))
+    try:
+        yield
+    finally:
+        bind.execute(sa.text(f"SET lock_timeout = '{previous}'"))
+
+def _drop_invalid_index(name: str):
+    # A failed CREATE INDEX CONCURRENTLY leaves an INVALID index behind
+    bind = op.get_bind()
+    invalid = bind.execute(
+        sa.text(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ),
+        {"name": name}
+    ).scalar()
+    if invalid:
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+def create_index_concurrently(name: str, table: str, columns: list, **kwargs):
+    """CREATE INDEX CONCURRENTLY outside the migration transaction (writes keep going)"""
+    started = time.monotonic()
+    with op.get_context().autocommit_block(), no_statement_timeout(), concurrent_lock_timeout():
+        _drop_invalid_index(name)
+        op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True, **kwargs)
+    print(f"   index {name} built in {time.monotonic() - started:.2f}s")
+
+def drop_index_concurrently(name: str, table: str):
+    with op.get_context().autocommit_block(), concurrent_lock_timeout():
+        op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+def backfill_in_batches(
+    table: str,
+    set_clause: str,
+    where: str = "TRUE",
+    batch_size: int = 5000,
+    pause_seconds: float = 0.0
+):
+    """UPDATE a table in id ranges, one short committed transaction per batch.
+
+    Row locks are only held for one batch. `where` should skip rows that are
+    already done, so a retried migration resumes where it stopped.
+    """
+    bind = op.get_bind()
+    started = time.monotonic()
+    updated = 0
+    with op.get_context().autocommit_block():
+        max_id = bind.execute(sa.text(f"SELECT coalesce(max(id), 0) FROM {table}")).scalar()
+        for start in range(0, max_id, batch_size):
+            result = bind.execute(
+                sa.text(f"UPDATE {table} SET {set_clause} WHERE id > :start AND id <= :end AND ({where})"),
+                {"start": start, "end": start + batch_size}
+            )
+            updated += result.rowcount
+            if pause_seconds:
+                time.sleep(pause_seconds)
+    print(f"   backfilled {updated} {table} rows in {time.monotonic() - started:.2f}s")
+
+def _constraint_exists(table: str, name: str) -> bool:
+    return bool(op.get_bind().execute(
+        sa.text("SELECT 1 FROM pg_constraint WHERE conrelid = CAST(:table AS regclass) AND conname = :name"),
+        {"table": table, "name": name}
+    ).scalar())
+
+def add_not_null_check(table: str, column: str, name: str):
+    """Enforce NOT NULL without a long ACCESS EXCLUSIVE scan.
+
+    The NOT VALID check is instant. It is committed before VALIDATE, which
+    only takes SHARE UPDATE EXCLUSIVE while it scans. An existing check of
+    that name (from an interrupted run) is validated as is.
+    """
+    if not _constraint_exists(table, name):
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} CHECK ({column} IS NOT NULL) NOT VALID")
+    _validate_constraint(table, name)
+
+def _validate_constraint(table: str, name: str):
+    with op.get_context().autocommit_block(), no_statement_timeout(), concurrent_lock_timeout():
+        op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {name}")
+
+def create_foreign_key_not_valid(
+    name: str,
+    source_table: str,
+    referent_table: str,
+    local_cols: List[str],
+    remote_cols: List[str]
+):
+    """Add a foreign key without blocking writes while existing rows are checked.
+
+    An existing constraint of that name is validated as is.
+    """
+    if not _constraint_exists(source_table, name):
+        op.execute(
+            f"ALTER TABLE {source_table} ADD CONSTRAINT {name} "
+            f"FOREIGN KEY ({', '.join(local_cols)}) REFERENCES {referent_table} ({', '.join(remote_cols)}) NOT VALID"
+        )
+    _validate_constraint(source_table, name)
+
+def replace_materialized_view(name: str, select_sql: str, unique_columns: List[str], unique_index: Optional[str] = None):
+    """Build a materialized view under a temporary name, then swap it in.
+
+    Readers keep using the old view while the new one is populated. The swap
+    locks the old view until the revision commits, so call this last. It runs
+    in the revision's transaction, so a retry starts it over cleanly.
+    """
+    unique_index = unique_index or f"ux_{name}"
+    op.execute(f"DROP MATERIALIZED VIEW IF EXISTS {name}_new")
+    with no_statement_timeout():
+        op.execute(f"CREATE MATERIALIZED VIEW {name}_new AS {select_sql}")
+        # REFRESH ... CONCURRENTLY requires a unique index on the view
+        op.create_index(f"{unique_index}_new", f"{name}_new", unique_columns, unique=True)
+    op.execute(f"DROP MATERIALIZED VIEW IF EXISTS {name}")
+    op.execute(f"ALTER MATERIALIZED VIEW {name}_new RENAME TO {name}")
+    op.execute(f"ALTER INDEX {unique_index}_new RENAME TO {unique_index}")
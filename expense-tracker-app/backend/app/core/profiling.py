@@ -0,0 +1,183 @@
+import base64
+import contextvars
+import hashlib
+import hmac
+import os
+import socket
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from typing import Optional
+
+# On-demand sampling profiler; nothing runs unless a profile is requested
+PROFILING_SECRET = os.getenv("PROFILING_SECRET")
+PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", "5"))
+PROFILING_MAX_SECONDS = int(os.getenv("PROFILING_MAX_SECONDS", "60"))
+# Signed headers further out than this are rejected, so a leaked one expires soon
+PROFILING_HEADER_TTL_SECONDS = int(os.getenv("PROFILING_HEADER_TTL_SECONDS", "300"))
+# Budget for the inline X-Profile response header (ingress header buffers are small)
+PROFILING_HEADER_MAX_BYTES = int(os.getenv("PROFILING_HEADER_MAX_BYTES", "3000"))
+PROFILE_HEADER = b"x-profile-request"
+# Which replica served a profile, so a whole-process result can be attributed
+POD_NAME = os.getenv("HOSTNAME") or socket.gethostname()
+
+_process_profile_lock = threading.Lock()
+# The Sampler profiling the current request; copied into threadpool workers
+_request_sampler: contextvars.ContextVar = contextvars.ContextVar("request_sampler", default=None)
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def _worker_context(frame) -> Optional[contextvars.Context]:
+    """The contextvars.Context a threadpool worker is running its job in.
+
+    anyio's worker loop holds the copied context in a local while it runs
+    the job, a few frames above the thread's bootstrap frames.
+    """
+    root = []
+    while frame is not None:
+        root.append(frame)
+        frame = frame.f_back
+    for frame in reversed(root[-4:]):
+        context = frame.f_locals.get("context")
+        if isinstance(context, contextvars.Context):
+            return context
+    return None
+
+class Sampler:
+    """Samples thread stacks in this process from a helper thread.
+
+    With request_frame set, only stacks working on that request are kept:
+    the event loop while the frame is on its stack, and threadpool workers
+    whose job context carries this sampler. Otherwise every thread is
+    sampled. The result is in collapsed-stack format ("root;child;leaf
+    count" per line), which flamegraph.pl, speedscope and inferno read
+    directly.
+    """
+
+    def __init__(self, interval_ms: float = PROFILING_INTERVAL_MS, request_frame=None):
+        self.interval = interval_ms / 1000
+        self.request_frame = request_frame
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                frames = []
+                while frame is not None:
+                    frames.append(frame)
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if self.request_frame is not None and not self._owns(frames):
+                    continue
+                stack.append(f"thread:{names.get(thread_id, thread_id)}")
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def _owns(self, frames) -> bool:
+        if any(frame is self.request_frame for frame in frames):
+            return True
+        context = _worker_context(frames[0])
+        return context is not None and context.get(_request_sampler) is self
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def header_value(self, max_bytes: int = PROFILING_HEADER_MAX_BYTES) -> str:
+        """zlib + base64 folded stacks, dropping the rarest stacks until it fits"""
+        lines = [f"{stack} {count}\n" for stack, count in self.stacks.most_common()]
+        while True:
+            value = base64.b64encode(zlib.compress("".join(lines).encode(), 9)).decode()
+            if len(value) <= max_bytes or not lines:
+                return value
+            lines = lines[:len(lines) // 2]
+
+def sign_profile_request(expires_at: int, secret: str = PROFILING_SECRET) -> str:
+    """Header value that authorizes profiling requests until expires_at (unix time)"""
+    signature = hmac.new(secret.encode(), str(expires_at).encode(), hashlib.sha256).hexdigest()
+    return f"{expires_at}.{signature}"
+
+def verify_profile_request(value: str) -> bool:
+    if not PROFILING_SECRET:
+        return False
+    expires_at, _, signature = value.partition(".")
+    if not expires_at.isdigit():
+        return False
+    now = time.time()
+    if not now <= int(expires_at) <= now + PROFILING_HEADER_TTL_SECONDS:
+        return False
+    expected = sign_profile_request(int(expires_at)).partition(".")[2]
+    return hmac.compare_digest(expected, signature)
+
+def profile_process(seconds: float, interval_ms: float = PROFILING_INTERVAL_MS) -> Optional[str]:
+    """Blocking whole-process profile; None if another one is already running"""
+    if not _process_profile_lock.acquire(blocking=False):
+        return None
+    try:
+        sampler = Sampler(interval_ms).start()
+        time.sleep(min(seconds, PROFILING_MAX_SECONDS))
+        return sampler.stop().folded()
+    finally:
+        _process_profile_lock.release()
+
+class ProfilingMiddleware:
+    """Profiles a single request carrying a valid signed X-Profile-Request header.
+
+    The collapsed stacks come back inline in the X-Profile response header
+    (zlib + base64), so the result never has to be fetched from the replica
+    that served the request. X-Profile-Pod names that replica.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        header = dict(scope["headers"]).get(PROFILE_HEADER)
+        if header is None or not verify_profile_request(header.decode("latin-1")):
+            await self.app(scope, receive, send)
+            return
+
+        sampler = Sampler(request_frame=sys._getframe()).start()
+        token = _request_sampler.set(sampler)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                profile = sampler.stop().header_value()
+                message = {
+                    **message,
+                    "headers": list(message.get("headers", [])) + [
+                        (b"x-profile", profile.encode()),
+                        (b"x-profile-pod", POD_NAME.encode()),
+                    ],
+                }
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_sampler.reset(token)
+            sampler.stop()
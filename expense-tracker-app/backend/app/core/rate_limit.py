@@ -0,0 +1,219 @@
+import asyncio
+import math
+import os
+import time
+from typing import Optional, Tuple
+from urllib.parse import parse_qs
+import jwt
+from fastapi.responses import JSONResponse
+from prometheus_client import Counter
+from sqlalchemy.pool import QueuePool
+from core import change_feed
+from core.auth import JWT_SECRET, JWT_ALGORITHM
+from db.database import engine, DB_POOL_SIZE, DB_MAX_OVERFLOW
+
+# Per-user token buckets plus a per-process cap on in-flight requests
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_CAPACITY = float(os.getenv("RATE_LIMIT_CAPACITY", "100"))
+RATE_LIMIT_REFILL_PER_SECOND = float(os.getenv("RATE_LIMIT_REFILL_PER_SECOND", "10"))
+
+def _pool_capacity() -> int:
+    """Connections the engine's pool can hand out at once (pool_size + max_overflow)"""
+    if isinstance(engine.pool, QueuePool):
+        return max(1, DB_POOL_SIZE + max(DB_MAX_OVERFLOW, 0))
+    # Other pools either share one connection or open one per checkout
+    return max(1, DB_POOL_SIZE)
+
+# Admitting more requests than the pool has connections only moves the queue
+# into the pool checkout (up to pool_timeout), so default to the pool size
+RATE_LIMIT_MAX_IN_FLIGHT = int(os.getenv("RATE_LIMIT_MAX_IN_FLIGHT") or _pool_capacity())
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL")
+
+# Token cost per request; the first matching (method, path prefix) wins
+ROUTE_COSTS = [
+    ("POST", "/api/expenses/seed", 50),
+    ("DELETE", "/api/expenses/clear", 20),
+    ("GET", "/api/expenses/reports/", 5),
+    ("GET", "/api/auth/proxy-image", 5),
+]
+DEFAULT_COST = 1
+
+# Never limited: probes, scraping and CORS preflight
+EXEMPT_PATHS = ("/api/ping", "/metrics")
+
+# Streams that stay open but idle; charged tokens, not held against the in-flight cap
+LONG_LIVED_PATHS = ("/api/expenses/changes",)
+
+REJECTED_REQUESTS = Counter(
+    "http_requests_rejected_total",
+    "Requests rejected by rate limiting or admission control",
+    ["reason"],
+)
+
+def route_cost(method: str, path: str) -> int:
+    for route_method, prefix, cost in ROUTE_COSTS:
+        if method == route_method and path.startswith(prefix):
+            return cost
+    return DEFAULT_COST
+
+async def client_key(scope) -> str:
+    """Rate-limit key: the user behind a JWT or stream ticket, otherwise the client address.
+
+    The address is the real client only where uvicorn trusts the proxy's
+    X-Forwarded-For (FORWARDED_ALLOW_IPS); anonymous requests are keyed by it.
+    """
+    headers = dict(scope["headers"])
+    authorization = headers.get(b"authorization", b"").decode("latin-1")
+    if authorization.lower().startswith("bearer "):
+        try:
+            payload = jwt.decode(authorization[7:], JWT_SECRET, algorithms=[JWT_ALGORITHM])
+            return f"user:{payload.get('user_id')}"
+        except jwt.PyJWTError:
+            pass
+    if scope["path"] in LONG_LIVED_PATHS:
+        ticket = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("ticket")
+        if ticket:
+            user_id = await asyncio.to_thread(change_feed.peek_ticket, ticket[0])
+            if user_id is not None:
+                return f"user:{user_id}"
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+class MemoryBackend:
+    """Token buckets held in this process"""
+
+    MAX_KEYS = 10000
+
+    def __init__(self, capacity: float = RATE_LIMIT_CAPACITY, refill_per_second: float = RATE_LIMIT_REFILL_PER_SECOND):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.buckets = {}
+
+    async def acquire(self, key: str, cost: int) -> Tuple[bool, float]:
+        now = time.monotonic()
+        tokens, updated_at = self.buckets.get(key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - updated_at) * self.refill_per_second)
+
+        if len(self.buckets) >= self.MAX_KEYS:
+            self._prune(now)
+
+        if tokens >= cost:
+            self.buckets[key] = (tokens - cost, now)
+            return True, 0.0
+        self.buckets[key] = (tokens, now)
+        return False, (cost - tokens) / self.refill_per_second
+
+    def _prune(self, now: float):
+        """Drop buckets that have refilled completely"""
+        full_after = self.capacity / self.refill_per_second
+        self.buckets = {
+            key: state for key, state in self.buckets.items()
+            if now - state[1] < full_after
+        }
+
+# Atomic token bucket; uses the server clock so replicas agree on time
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(retry_after)}
+"""
+
+class RedisBackend:
+    """Token buckets shared by all replicas through any Redis-protocol server"""
+
+    def __init__(self, url: str, capacity: float = RATE_LIMIT_CAPACITY, refill_per_second: float = RATE_LIMIT_REFILL_PER_SECOND):
+        import redis.asyncio as redis
+
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.client = redis.from_url(url)
+        self.script = self.client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    async def acquire(self, key: str, cost: int) -> Tuple[bool, float]:
+        try:
+            allowed, retry_after = await self.script(
+                keys=[f"ratelimit:{key}"],
+                args=[self.capacity, self.refill_per_second, cost],
+            )
+        except Exception as e:
+            # Fail open: an unavailable limiter must not take the API down
+            print("❌ Rate limit backend error:", e)
+            return True, 0.0
+        return bool(allowed), float(retry_after)
+
+def create_backend():
+    if RATE_LIMIT_REDIS_URL:
+        return RedisBackend(RATE_LIMIT_REDIS_URL)
+    return MemoryBackend()
+
+def _reject(status_code: int, detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        status_code=status_code,
+        content={"detail": detail},
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+class RateLimitMiddleware:
+    """Sheds load before a request reaches the routes (and the DB pool).
+
+    Requests beyond the per-process in-flight cap get 503; requests from a
+    user whose token bucket cannot cover the route cost get 429.
+    """
+
+    def __init__(self, app, backend=None, max_in_flight: int = RATE_LIMIT_MAX_IN_FLIGHT):
+        self.app = app
+        self.backend = backend or create_backend()
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] == "OPTIONS"
+            or scope["path"].startswith(EXEMPT_PATHS)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        long_lived = scope["path"] in LONG_LIVED_PATHS
+        response: Optional[JSONResponse] = None
+        if not long_lived and self.in_flight >= self.max_in_flight:
+            REJECTED_REQUESTS.labels("overloaded").inc()
+            response = _reject(503, "Server busy, retry later", 1)
+        else:
+            allowed, retry_after = await self.backend.acquire(
+                await client_key(scope), route_cost(scope["method"], scope["path"])
+            )
+            if not allowed:
+                REJECTED_REQUESTS.labels("rate_limited").inc()
+                response = _reject(429, "Too many requests", retry_after)
+
+        if response is not None:
+            await response(scope, receive, send)
+            return
+        if long_lived:
+            await self.app(scope, receive, send)
+            return
+
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
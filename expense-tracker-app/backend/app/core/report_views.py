@@ -0,0 +1,94 @@
+import os
+import threading
+from typing import Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from db.database import engine
+
+# Materialized report views (per-user monthly x category aggregates)
+REPORT_VIEWS_ENABLED = os.getenv("REPORT_VIEWS_ENABLED", "false").lower() == "true"
+REPORT_VIEWS_REFRESH_SECONDS = int(os.getenv("REPORT_VIEWS_REFRESH_SECONDS", "300"))
+REPORT_VIEWS_MAX_STALENESS_SECONDS = int(os.getenv("REPORT_VIEWS_MAX_STALENESS_SECONDS", "900"))
+
+REPORT_VIEW_NAME = "expense_monthly_category_mv"
+
+# Advisory lock id shared by all replicas so only one refreshes at a time
+REFRESH_LOCK_KEY = 726001
+
+# On-demand refreshes requested in this process while one is already waiting
+_pending_lock = threading.Lock()
+_pending = False
+_waiting = False
+
+def refresh_report_views(wait: bool = False) -> bool:
+    """Refresh the report view if no other replica is refreshing it.
+
+    With wait=True, block until a refresh in progress elsewhere finishes and
+    then refresh again, since it may have started before the caller's
+    writes. Returns True when this process performed the refresh.
+    """
+    with engine.connect() as conn:
+        if wait:
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": REFRESH_LOCK_KEY})
+        else:
+            locked = conn.execute(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": REFRESH_LOCK_KEY}
+            ).scalar()
+            if not locked:
+                conn.commit()
+                return False
+        conn.commit()
+        try:
+            conn.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {REPORT_VIEW_NAME}"))
+            conn.execute(
+                text("UPDATE report_view_state SET refreshed_at = now() WHERE view_name = :name"),
+                {"name": REPORT_VIEW_NAME}
+            )
+            conn.commit()
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": REFRESH_LOCK_KEY})
+            conn.commit()
+    return True
+
+def request_refresh():
+    """On-demand refresh after bulk writes; a no-op when views are disabled.
+
+    Requests arriving while this process already waits for the lock are
+    coalesced into one more refresh, so none is dropped.
+    """
+    global _pending, _waiting
+    if not REPORT_VIEWS_ENABLED:
+        return
+    with _pending_lock:
+        _pending = True
+        if _waiting:
+            return
+        _waiting = True
+    try:
+        while True:
+            with _pending_lock:
+                if not _pending:
+                    _waiting = False
+                    return
+                _pending = False
+            refresh_report_views(wait=True)
+    except Exception:
+        with _pending_lock:
+            _waiting = False
+        raise
+
+def get_view_age(db: Session) -> Optional[float]:
+    """Seconds since the report view was last refreshed"""
+    return db.execute(
+        text("SELECT extract(epoch FROM now() - refreshed_at) FROM report_view_state WHERE view_name = :name"),
+        {"name": REPORT_VIEW_NAME}
+    ).scalar()
+
+def fresh_view_age(db: Session) -> Optional[float]:
+    """Age of the report view if reports should be served from it, otherwise None"""
+    if not REPORT_VIEWS_ENABLED:
+        return None
+    age = get_view_age(db)
+    if age is None or age > REPORT_VIEWS_MAX_STALENESS_SECONDS:
+        return None
+    return float(age)
@@ -0,0 +1,14 @@
+from typing import Any
+import orjson
+from fastapi.responses import Response
+
+class FastJSONResponse(Response):
+    """JSON response rendered with orjson, bypassing jsonable_encoder.
+
+    Return it directly from a route with plain dicts/lists so FastAPI skips
+    response_model validation; response_model is still used for the docs.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
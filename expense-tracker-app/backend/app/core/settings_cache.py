@@ -0,0 +1,82 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+import orjson
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# In-process cache of user settings (theme, currency) for display reads.
+# Updates write through locally and NOTIFY the other replicas, which drop
+# their copy; until that arrives (or the TTL expires if LISTEN is down) a
+# replica can serve the old values, so write paths never read from here.
+SETTINGS_CACHE_ENABLED = os.getenv("SETTINGS_CACHE_ENABLED", "true").lower() == "true"
+SETTINGS_CACHE_TTL_SECONDS = int(os.getenv("SETTINGS_CACHE_TTL_SECONDS", "300"))
+SETTINGS_CACHE_SIZE = int(os.getenv("SETTINGS_CACHE_SIZE", "10000"))
+SETTINGS_CHANNEL = "user_settings_changes"
+
+# Lets a process ignore its own invalidations (it already wrote through)
+_ORIGIN = uuid.uuid4().hex
+
+_entries: "OrderedDict[int, tuple]" = OrderedDict()
+_lock = threading.Lock()
+# Bumped by every invalidation; a load that raced with one is not stored
+_generation = 0
+
+def _store(user_id: int, values: Dict[str, str]):
+    _entries[user_id] = (time.monotonic() + SETTINGS_CACHE_TTL_SECONDS, values)
+    _entries.move_to_end(user_id)
+    if len(_entries) > SETTINGS_CACHE_SIZE:
+        _entries.popitem(last=False)
+
+def get_or_load(user_id: int, load: Callable[[], Dict[str, str]]) -> Dict[str, str]:
+    """Cached settings for a user, calling load() on a miss. Do not mutate the result.
+
+    May lag an update made on another replica; not for deciding what to write.
+    """
+    if not SETTINGS_CACHE_ENABLED:
+        return load()
+    with _lock:
+        entry = _entries.get(user_id)
+        if entry and entry[0] > time.monotonic():
+            _entries.move_to_end(user_id)
+            return entry[1]
+        generation = _generation
+    values = load()
+    with _lock:
+        if generation == _generation:
+            _store(user_id, values)
+    return values
+
+def put(user_id: int, values: Dict[str, str]):
+    """Write-through after a committed update"""
+    if not SETTINGS_CACHE_ENABLED:
+        return
+    global _generation
+    with _lock:
+        _generation += 1
+        _store(user_id, values)
+
+def invalidate(user_id: Optional[int] = None):
+    """Drop one user's entry, or everything when user_id is None"""
+    global _generation
+    with _lock:
+        _generation += 1
+        if user_id is None:
+            _entries.clear()
+        else:
+            _entries.pop(user_id, None)
+
+def notify_invalidation(db: Session, user_id: int):
+    """Queue an invalidation for other replicas in the caller's transaction"""
+    db.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": SETTINGS_CHANNEL, "payload": orjson.dumps({"user_id": user_id, "origin": _ORIGIN}).decode()}
+    )
+
+def on_notify(payload: str):
+    message = orjson.loads(payload)
+    if message.get("origin") != _ORIGIN:
+        invalidate(message["user_id"])
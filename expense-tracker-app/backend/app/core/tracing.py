@@ -0,0 +1,280 @@
+import json
+import logging
+import os
+import queue
+import sys
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+from typing import Optional
+from sqlalchemy import event
+
+# Request tracing: FastAPI routes, SQL statements and outbound HTTP calls
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+TRACING_SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "0.1"))
+TRACING_SLOW_THRESHOLD_MS = float(os.getenv("TRACING_SLOW_THRESHOLD_MS", "500"))
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "file")
+TRACING_FILE = os.getenv("TRACING_FILE", "traces.jsonl")  # "-" writes to stdout
+TRACING_FILE_MAX_BYTES = int(os.getenv("TRACING_FILE_MAX_BYTES", str(50 * 1024 * 1024)))
+TRACING_FILE_BACKUPS = int(os.getenv("TRACING_FILE_BACKUPS", "3"))
+TRACING_QUEUE_SIZE = int(os.getenv("TRACING_QUEUE_SIZE", "10000"))
+
+MAX_STATEMENT_LENGTH = 500
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+class Trace:
+    """Spans of one request; exported together once the root span ends"""
+    __slots__ = ("trace_id", "sampled", "spans")
+
+    def __init__(self, trace_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.spans = []
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "attributes", "status", "start", "end")
+
+    def __init__(self, trace: Trace, parent_id: Optional[str], name: str, attributes: dict):
+        self.trace = trace
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.status = "ok"
+        self.start = time.time()
+        self.end = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def finish(self):
+        self.end = time.time()
+        self.trace.spans.append(self)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end or time.time()) - self.start) * 1000
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+class _NoopSpan:
+    """Returned when tracing is off or there is no active trace"""
+
+    def set_attribute(self, key: str, value):
+        pass
+
+_NOOP_SPAN = _NoopSpan()
+
+class InMemoryExporter:
+    """Collects finished spans in memory (for tests)"""
+
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans):
+        self.spans.extend(span.to_dict() for span in spans)
+
+    def clear(self):
+        self.spans.clear()
+
+class FileExporter:
+    """Writes finished spans as JSON lines from a background thread.
+
+    export() only enqueues, so the event loop never blocks on disk; spans
+    are dropped when the queue is full. The file is rotated at
+    TRACING_FILE_MAX_BYTES, keeping TRACING_FILE_BACKUPS old files.
+    """
+
+    def __init__(self, path: str = TRACING_FILE):
+        self.path = path
+        self.queue: queue.Queue = queue.Queue(maxsize=TRACING_QUEUE_SIZE)
+        self.dropped = 0
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+
+    def _logger(self) -> logging.Logger:
+        logger = logging.getLogger("expense_tracker.traces")
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        if not logger.handlers:
+            if self.path == "-":
+                handler = logging.StreamHandler(sys.stdout)
+            else:
+                handler = RotatingFileHandler(
+                    self.path, maxBytes=TRACING_FILE_MAX_BYTES, backupCount=TRACING_FILE_BACKUPS
+                )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+        return logger
+
+    def _run(self):
+        logger = self._logger()
+        while True:
+            spans = self.queue.get()
+            try:
+                for span in spans:
+                    logger.info(json.dumps(span, default=str))
+            except Exception as e:
+                print("❌ Trace export failed:", e)
+
+    def export(self, spans):
+        if self._thread is None:
+            with self._thread_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                    self._thread.start()
+        try:
+            self.queue.put_nowait([span.to_dict() for span in spans])
+        except queue.Full:
+            self.dropped += 1
+
+exporter = InMemoryExporter() if TRACING_EXPORTER == "memory" else FileExporter()
+
+@contextmanager
+def start_span(name: str, **attributes):
+    """Child span of the current request span; a no-op outside a traced request"""
+    parent = _current_span.get() if TRACING_ENABLED else None
+    if parent is None:
+        yield _NOOP_SPAN
+        return
+
+    span = Span(parent.trace, parent.span_id, name, attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except Exception as e:
+        span.status = "error"
+        span.attributes["error"] = repr(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        span.finish()
+
+def inject_headers(headers: Optional[dict] = None) -> dict:
+    """Add a W3C traceparent header for the current span to outbound requests"""
+    headers = dict(headers or {})
+    span = _current_span.get()
+    if span is not None:
+        flags = "01" if span.trace.sampled else "00"
+        headers["traceparent"] = f"00-{span.trace.trace_id}-{span.span_id}-{flags}"
+    return headers
+
+def _parse_traceparent(value: str):
+    parts = value.split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return parts[1], parts[2], parts[3] == "01"
+
+def _route_template(scope) -> Optional[str]:
+    """Matched route path (e.g. /api/expenses/{expense_id}) including router prefixes"""
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    if path is None:
+        return None
+    # Some FastAPI versions expose the route path without the include prefix
+    segments = scope["path"].split("/")
+    template_segments = path.split("/")
+    prefix = "/".join(segments[:len(segments) - len(template_segments) + 1])
+    return prefix + path
+
+class TracingMiddleware:
+    """Root span per HTTP request.
+
+    Head sampling keeps TRACING_SAMPLE_RATE of traces (or follows an incoming
+    sampled traceparent); requests slower than TRACING_SLOW_THRESHOLD_MS are
+    always kept.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        incoming = _parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        if incoming:
+            trace_id, parent_id, sampled = incoming
+        else:
+            trace_id, parent_id, sampled = _new_id(128), None, random.random() < TRACING_SAMPLE_RATE
+
+        trace = Trace(trace_id, sampled)
+        span = Span(trace, parent_id, f"{scope['method']} {scope['path']}", {
+            "http.method": scope["method"],
+            "http.target": scope["path"],
+        })
+        token = _current_span.set(span)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                span.set_attribute("http.status_code", message["status"])
+                if message["status"] >= 500:
+                    span.status = "error"
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            span.status = "error"
+            span.attributes["error"] = repr(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            template = _route_template(scope)
+            if template is not None:
+                span.name = f"{scope['method']} {template}"
+                span.set_attribute("http.route", template)
+            span.finish()
+            if trace.sampled or span.duration_ms >= TRACING_SLOW_THRESHOLD_MS:
+                exporter.export(trace.spans)
+
+def instrument_engine(engine):
+    """Record a span for every SQL statement run inside a traced request"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        parent = _current_span.get()
+        if parent is None:
+            return
+        context._trace_span = Span(parent.trace, parent.span_id, "db.query", {
+            "db.system": "postgresql",
+            "db.statement": statement[:MAX_STATEMENT_LENGTH],
+            "db.executemany": executemany,
+        })
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        span = getattr(context, "_trace_span", None)
+        if span is not None:
+            span.set_attribute("db.rowcount", cursor.rowcount)
+            span.finish()
+            context._trace_span = None
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        context = exception_context.execution_context
+        span = getattr(context, "_trace_span", None) if context is not None else None
+        if span is not None:
+            span.status = "error"
+            span.set_attribute("error", repr(exception_context.original_exception))
+            span.finish()
+            context._trace_span = None
@@ -1,98 +1,414 @@
 from sqlalchemy.orm import Session
 from models.expense_model import Expense
-from schemas.expense_schema import ExpenseCreate, ExpenseUpdate
+from models.user_model import User
+from models.report_view_model import ExpenseMonthlyCategory
+from schemas.expense_schema import ExpenseCreate, ExpenseUpdate, amount_columns
+from core.change_feed import notify_change
+from core.categories import is_valid_category
 from datetime import datetime, timedelta
-from sqlalchemy import func
-from typing import List, Dict, Any
+from sqlalchemy import func, cast, Integer, text, select, insert, and_
+from typing import List, Dict, Any, Optional, Tuple
+
+def _current_generation(user_id: int):
+    return select(User.expense_generation).where(User.id == user_id).scalar_subquery()
+
+def _visible(user_id: int):
+    """Filter for a user's expenses, hiding rows queued for bulk deletion"""
+    return and_(Expense.user_id == user_id, Expense.generation == _current_generation(user_id))
+
+# Same filter for raw SQL queries that bind :user_id
+VISIBLE_SQL = "user_id = :user_id AND generation = (SELECT expense_generation FROM users WHERE id = :user_id)"
+
+# Writes run in the caller's transaction and only flush; the route commits
+# once, together with its idempotency record
 
 def create_expense(db: Session, expense: ExpenseCreate, user_id: int):
     db_expense = Expense(
         user_id=user_id,
+        generation=_current_generation(user_id),
         title=expense.title,
-        amount=expense.amount,
         category=expense.category or "Other",
-        date=expense.date or datetime.now()
+        date=expense.date or datetime.now(),
+        **amount_columns(expense.amount)
     )
     db.add(db_expense)
-    db.commit()
+    db.flush()
+    notify_change(db, user_id, "created", db_expense.id)
     db.refresh(db_expense)
     return db_expense
 
 def get_expenses(db: Session, user_id: int, skip: int = 0, limit: int = 100):
-    return db.query(Expense).filter(Expense.user_id == user_id).offset(skip).limit(limit).all()
+    return db.query(Expense).filter(_visible(user_id)).offset(skip).limit(limit).all()
+
+# ExpenseResponse fields and the columns they are read from on the fast list
+# path; rows carry amount_minor, converted to amount by the schema layer
+EXPENSE_RESPONSE_COLUMNS = {
+    "id": Expense.id,
+    "title": Expense.title,
+    "amount": Expense.amount_minor,
+    "category": Expense.category,
+    "date": Expense.date,
+    "created_at": Expense.created_at,
+}
+EXPENSE_RESPONSE_FIELDS = tuple(EXPENSE_RESPONSE_COLUMNS)
+EXPENSE_ROW_KEYS = tuple(column.key for column in EXPENSE_RESPONSE_COLUMNS.values())
+
+def _rows_to_dicts(rows, keys=EXPENSE_ROW_KEYS) -> List[Dict[str, Any]]:
+    return [dict(zip(keys, row)) for row in rows]
+
+def get_expense_rows(
+    db: Session,
+    user_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    fields: Optional[List[str]] = None
+) -> List[Dict[str, Any]]:
+    """Get expenses as plain dicts without loading ORM entities.
+
+    fields selects a sparse subset of EXPENSE_RESPONSE_FIELDS.
+    """
+    columns = [EXPENSE_RESPONSE_COLUMNS[field] for field in fields or EXPENSE_RESPONSE_FIELDS]
+    rows = db.execute(
+        select(*columns).where(_visible(user_id)).offset(skip).limit(limit)
+    ).all()
+    return _rows_to_dicts(rows, [column.key for column in columns])
+
+def bulk_create_expense_rows(db: Session, expenses: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Insert many expenses in one round trip and return them as plain dicts.
+
+    Sends no change events; the caller reports the operation (seeding sends
+    one reset from start_bulk_delete).
+    """
+    if not expenses:
+        return []
+    # Checked against the in-memory registry before touching the database
+    invalid = {expense["category"] for expense in expenses if not is_valid_category(expense["category"])}
+    if invalid:
+        raise ValueError(f"Invalid categories: {', '.join(sorted(map(str, invalid)))}")
+    rows = db.execute(insert(Expense).returning(*EXPENSE_RESPONSE_COLUMNS.values()), expenses).all()
+    return _rows_to_dicts(rows)
+
+def _search_query(
+    user_id: int,
+    q: str,
+    category: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cursor: Optional[Tuple[float, int]] = None,
+    limit: int = 20
+):
+    """Build the ranked title search for one user.
+
+    Matches use the trigram index (similarity, substring ILIKE) or the
+    tsvector index (word search). Results are ordered by (score, id) so the
+    last row of a page is a stable keyset cursor.
+    """
+    escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    params = {
+        "user_id": user_id,
+        "q": q,
+        "contains": f"%{escaped}%",
+        "prefix": f"{escaped}%",
+        "limit": limit,
+    }
+    filters = ""
+    if category:
+        filters += " AND category = :category"
+        params["category"] = category
+    if start:
+        filters += " AND date >= :start"
+        params["start"] = start
+    if end:
+        filters += " AND date < :end"
+        params["end"] = end
+
+    keyset = ""
+    if cursor:
+        keyset = "WHERE (score, id) < (:cursor_score, :cursor_id)"
+        params["cursor_score"], params["cursor_id"] = cursor
+
+    query = text(f"""
+        SELECT id, title, amount_minor, category, date, created_at, score
+        FROM (
+            SELECT id, title, amount_minor, category, date, created_at,
+                   CAST(
+                       similarity(title, :q)
+                       + ts_rank(to_tsvector('simple', title), plainto_tsquery('simple', :q))
+                       + CASE WHEN title ILIKE :prefix THEN 1 ELSE 0 END
+                   AS double precision) AS score
+            FROM expenses
+            WHERE {VISIBLE_SQL}
+              AND (
+                  title ILIKE :contains
+                  OR title % :q
+                  OR to_tsvector('simple', title) @@ plainto_tsquery('simple', :q)
+              )
+              {filters}
+        ) matches
+        {keyset}
+        ORDER BY score DESC, id DESC
+        LIMIT :limit
+    """)
+    return query, params
+
+def search_expenses(
+    db: Session,
+    user_id: int,
+    q: str,
+    category: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cursor: Optional[Tuple[float, int]] = None,
+    limit: int = 20
+) -> Tuple[List[Dict[str, Any]], Optional[Tuple[float, int]]]:
+    """Search expense titles; returns a page of rows and the next cursor"""
+    query, params = _search_query(user_id, q, category, start, end, cursor, limit + 1)
+    rows = db.execute(query, params).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = (rows[-1].score, rows[-1].id)
+    return _rows_to_dicts(rows), next_cursor
 
 def get_expense_by_id(db: Session, expense_id: int, user_id: int):
-    return db.query(Expense).filter(Expense.id == expense_id, Expense.user_id == user_id).first()
+    return db.query(Expense).filter(Expense.id == expense_id, _visible(user_id)).first()
 
 def update_expense(db: Session, expense_id: int, expense_update: ExpenseUpdate, user_id: int):
-    db_expense = db.query(Expense).filter(Expense.id == expense_id, Expense.user_id == user_id).first()
+    db_expense = db.query(Expense).filter(Expense.id == expense_id, _visible(user_id)).first()
     if db_expense:
-        update_data = expense_update.dict(exclude_unset=True)
+        update_data = expense_update.to_columns()
         for field, value in update_data.items():
             setattr(db_expense, field, value)
-        db.commit()
+        db.flush()
+        notify_change(db, user_id, "updated", expense_id)
         db.refresh(db_expense)
     return db_expense
 
 def delete_expense(db: Session, expense_id: int, user_id: int):
-    db_expense = db.query(Expense).filter(Expense.id == expense_id, Expense.user_id == user_id).first()
+    db_expense = db.query(Expense).filter(Expense.id == expense_id, _visible(user_id)).first()
     if db_expense:
         db.delete(db_expense)
-        db.commit()
+        db.flush()
+        notify_change(db, user_id, "deleted", expense_id)
     return db_expense
 
+# Reporting date of an expense; same expression as the materialized view,
+# so live and view-backed reports agree for rows without a date
+EXPENSE_REPORT_DATE = func.coalesce(Expense.date, Expense.created_at)
+EXPENSE_REPORT_DATE_SQL = "coalesce(date, created_at)"
+
+# Report rows carry integer sums in minor units (total_amount_minor); the
+# schema layer converts them to major units
+def _category_report_rows(result) -> List[Dict[str, Any]]:
+    totals = [int(row.total_amount_minor) for row in result]
+    total = sum(totals)
+
+    return [
+        {
+            "category": row.category,
+            "total_amount_minor": amount,
+            "count": row.count,
+            "percentage": round((amount * 100 / total), 2) if total > 0 else 0
+        }
+        for row, amount in zip(result, totals)
+    ]
+
 def get_category_report(db: Session, user_id: int) -> List[Dict[str, Any]]:
     """Get expense report grouped by category for specific user"""
     result = db.query(
         Expense.category,
-        func.sum(Expense.amount).label('total_amount'),
+        func.sum(Expense.amount_minor).label('total_amount_minor'),
         func.count(Expense.id).label('count')
-    ).filter(Expense.user_id == user_id).group_by(Expense.category).all()
+    ).filter(_visible(user_id), EXPENSE_REPORT_DATE.isnot(None)).group_by(Expense.category).all()
 
-    total = sum(row.total_amount for row in result)
+    return _category_report_rows(result)
+
+def get_category_report_from_view(db: Session, user_id: int) -> List[Dict[str, Any]]:
+    """Get category report from the materialized monthly x category view"""
+    result = db.query(
+        ExpenseMonthlyCategory.category,
+        func.sum(ExpenseMonthlyCategory.total_amount_minor).label('total_amount_minor'),
+        cast(func.sum(ExpenseMonthlyCategory.count), Integer).label('count')
+    ).filter(
+        ExpenseMonthlyCategory.user_id == user_id
+    ).group_by(ExpenseMonthlyCategory.category).all()
 
+    return _category_report_rows(result)
+
+def _monthly_report_rows(result) -> List[Dict[str, Any]]:
     return [
         {
-            "category": row.category,
-            "total_amount": float(row.total_amount),
-            "count": row.count,
-            "percentage": round((row.total_amount / total * 100), 2) if total > 0 else 0
+            "month": row.month.strftime("%B %Y"),
+            "total_amount_minor": int(row.total_amount_minor),
+            "count": row.count
         }
         for row in result
     ]
 
+def _monthly_report_start(months: int) -> datetime:
+    return datetime.now() - timedelta(days=months * 30)
+
+def _live_monthly_rows(db: Session, user_id: int, start_date: datetime, end_date: Optional[datetime] = None):
+    filters = [_visible(user_id), EXPENSE_REPORT_DATE >= start_date]
+    if end_date is not None:
+        filters.append(EXPENSE_REPORT_DATE < end_date)
+    return db.query(
+        func.date_trunc('month', EXPENSE_REPORT_DATE).label('month'),
+        func.sum(Expense.amount_minor).label('total_amount_minor'),
+        func.count(Expense.id).label('count')
+    ).filter(
+        *filters
+    ).group_by(
+        func.date_trunc('month', EXPENSE_REPORT_DATE)
+    ).order_by(
+        func.date_trunc('month', EXPENSE_REPORT_DATE)
+    ).all()
+
 def get_monthly_report(db: Session, user_id: int, months: int = 6) -> List[Dict[str, Any]]:
     """Get monthly expense report for the last N months for specific user"""
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=months * 30)
+    return _monthly_report_rows(_live_monthly_rows(db, user_id, _monthly_report_start(months)))
+
+def get_monthly_report_from_view(db: Session, user_id: int, months: int = 6) -> List[Dict[str, Any]]:
+    """Get monthly report from the materialized view.
+
+    The view only holds whole months. When the range starts mid-month, that
+    first month is summed live from the start, as get_monthly_report does.
+    """
+    start_date = _monthly_report_start(months)
+    first_view_month = start_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    partial = []
+    if first_view_month < start_date:
+        first_view_month = (first_view_month + timedelta(days=32)).replace(day=1)
+        partial = _live_monthly_rows(db, user_id, start_date, first_view_month)
 
     result = db.query(
-        func.date_trunc('month', Expense.date).label('month'),
-        func.sum(Expense.amount).label('total_amount'),
-        func.count(Expense.id).label('count')
+        ExpenseMonthlyCategory.month,
+        func.sum(ExpenseMonthlyCategory.total_amount_minor).label('total_amount_minor'),
+        cast(func.sum(ExpenseMonthlyCategory.count), Integer).label('count')
     ).filter(
-        Expense.user_id == user_id,
-        Expense.date >= start_date
+        ExpenseMonthlyCategory.user_id == user_id,
+        ExpenseMonthlyCategory.month >= first_view_month
     ).group_by(
-        func.date_trunc('month', Expense.date)
+        ExpenseMonthlyCategory.month
     ).order_by(
-        func.date_trunc('month', Expense.date)
+        ExpenseMonthlyCategory.month
     ).all()
 
-    return [
-        {
-            "month": row.month.strftime("%B %Y"),
-            "total_amount": float(row.total_amount),
-            "count": row.count
+    return _monthly_report_rows(partial + result)
+
+# Bucket step for each supported analytics granularity (date_trunc field)
+ANALYTICS_GRANULARITIES = {
+    "day": "1 day",
+    "week": "1 week",
+    "month": "1 month",
+    "year": "1 year",
+}
+
+def get_analytics_report(
+    db: Session,
+    user_id: int,
+    granularity: str,
+    start: datetime,
+    end: datetime,
+    category: Optional[str] = None,
+    compare: bool = True
+) -> Dict[str, Any]:
+    """Get zero-filled totals per bucket between start and end in one SQL pass.
+
+    The range is widened to whole buckets. When compare is set, the same number
+    of buckets immediately before the range is returned as the previous period.
+    """
+    category_filter = "AND category = :category" if category else ""
+    query = text(f"""
+        WITH current_buckets AS (
+            SELECT bucket, idx
+            FROM generate_series(
+                date_trunc(:granularity, CAST(:start AS timestamp)),
+                date_trunc(:granularity, CAST(:end AS timestamp)),
+                CAST(:step AS interval)
+            ) WITH ORDINALITY AS s(bucket, idx)
+        ),
+        previous_buckets AS (
+            SELECT bucket - (SELECT count(*) FROM current_buckets) * CAST(:step AS interval) AS bucket, idx
+            FROM current_buckets
+        ),
+        totals AS (
+            SELECT date_trunc(:granularity, {EXPENSE_REPORT_DATE_SQL}) AS bucket,
+                   sum(amount_minor) AS total_amount_minor,
+                   count(id) AS count
+            FROM expenses
+            WHERE {VISIBLE_SQL}
+              AND {EXPENSE_REPORT_DATE_SQL} >= CASE WHEN :compare
+                               THEN (SELECT min(bucket) FROM previous_buckets)
+                               ELSE (SELECT min(bucket) FROM current_buckets) END
+              AND {EXPENSE_REPORT_DATE_SQL} < (SELECT max(bucket) FROM current_buckets) + CAST(:step AS interval)
+              {category_filter}
+            GROUP BY 1
+        )
+        SELECT c.bucket,
+               coalesce(ct.total_amount_minor, 0) AS total_amount_minor,
+               coalesce(ct.count, 0) AS count,
+               p.bucket AS previous_bucket,
+               coalesce(pt.total_amount_minor, 0) AS previous_total_amount_minor,
+               coalesce(pt.count, 0) AS previous_count
+        FROM current_buckets c
+        JOIN previous_buckets p USING (idx)
+        LEFT JOIN totals ct ON ct.bucket = c.bucket
+        LEFT JOIN totals pt ON pt.bucket = p.bucket
+        ORDER BY c.idx
+    """)
+    params = {
+        "user_id": user_id,
+        "granularity": granularity,
+        "step": ANALYTICS_GRANULARITIES[granularity],
+        "start": start,
+        "end": end,
+        "compare": compare,
+    }
+    if category:
+        params["category"] = category
+    rows = db.execute(query, params).all()
+
+    # Columnar output keeps large series cheap to serialize
+    buckets = [row.bucket.date().isoformat() for row in rows]
+    amounts = [int(row.total_amount_minor) for row in rows]
+    counts = [row.count for row in rows]
+    total_amount = sum(amounts)
+    total_count = sum(counts)
+
+    report = {
+        "granularity": granularity,
+        "category": category,
+        "buckets": buckets,
+        "total_amount_minor": amounts,
+        "count": counts,
+        "previous": None,
+        "summary": {"total_amount_minor": total_amount, "count": total_count}
+    }
+
+    if compare:
+        previous_amounts = [int(row.previous_total_amount_minor) for row in rows]
+        previous_counts = [row.previous_count for row in rows]
+        previous_total = sum(previous_amounts)
+        report["previous"] = {
+            "buckets": [row.previous_bucket.date().isoformat() for row in rows],
+            "total_amount_minor": previous_amounts,
+            "count": previous_counts
         }
-        for row in result
-    ]
+        report["summary"].update({
+            "previous_total_amount_minor": previous_total,
+            "previous_count": sum(previous_counts),
+            "change_percentage": round((total_amount - previous_total) * 100 / previous_total, 2) if previous_total > 0 else None
+        })
+
+    return report
 
-def get_total_expenses(db: Session, user_id: int) -> float:
-    """Get total expenses amount for specific user"""
-    result = db.query(func.sum(Expense.amount)).filter(Expense.user_id == user_id).scalar()
-    return float(result) if result else 0.0
+def get_total_expenses(db: Session, user_id: int) -> int:
+    """Get total expenses amount for specific user, in minor units"""
+    result = db.query(func.sum(Expense.amount_minor)).filter(_visible(user_id)).scalar()
+    return int(result) if result else 0
 
 def get_expenses_count(db: Session, user_id: int) -> int:
     """Get total number of expenses for specific user"""
-    return db.query(Expense).filter(Expense.user_id == user_id).count()
\ No newline at end of file
+    return db.query(Expense).filter(_visible(user_id)).count()
\ No newline at end of file
@@ -11,12 +11,16 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL is not set")
 
+# Connection pool limits; admission control (core/rate_limit.py) sizes to them
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+
 MAX_RETRIES = 10
 WAIT_SECONDS = 2
 
 for attempt in range(MAX_RETRIES):
     try:
-        engine = create_engine(DATABASE_URL)
+        engine = create_engine(DATABASE_URL, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW)
         engine.connect()  # test connection
         break
     except OperationalError:
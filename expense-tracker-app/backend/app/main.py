@@ -1,23 +1,83 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from api import expense_routes, auth_routes, user_settings_routes
+from api import expense_routes, auth_routes, user_settings_routes, admin_routes
 from db.database import engine, Base
 from core.migrate import run_migrations
+from core import background, report_views, bulk_delete, idempotency, change_feed, settings_cache
+from core.compression import CompressionMiddleware
+from core.rate_limit import RateLimitMiddleware, RATE_LIMIT_ENABLED
+from core.tracing import TracingMiddleware, instrument_engine, TRACING_ENABLED
+from core.profiling import ProfilingMiddleware, PROFILING_SECRET
+from core.responses import FastJSONResponse
 from prometheus_fastapi_instrumentator import Instrumentator
 
-app = FastAPI(title="Expense Tracker API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if report_views.REPORT_VIEWS_ENABLED:
+        background.start_periodic(
+            "refresh-report-views",
+            report_views.REPORT_VIEWS_REFRESH_SECONDS,
+            report_views.refresh_report_views,
+        )
+    # Resume bulk deletes interrupted by a restart, and retry stuck ones
+    background.start_periodic(
+        "resume-bulk-delete-jobs",
+        bulk_delete.BULK_DELETE_RESUME_SECONDS,
+        bulk_delete.resume_pending_jobs,
+    )
+    background.start_periodic(
+        "cleanup-idempotency-keys",
+        idempotency.IDEMPOTENCY_CLEANUP_SECONDS,
+        idempotency.cleanup_expired_keys,
+    )
+    if settings_cache.SETTINGS_CACHE_ENABLED:
+        # Invalidations from other replicas ride on the change feed connection
+        change_feed.hub.listen(settings_cache.SETTINGS_CHANNEL, settings_cache.on_notify, settings_cache.invalidate)
+    if change_feed.CHANGE_FEED_ENABLED or settings_cache.SETTINGS_CACHE_ENABLED:
+        await change_feed.hub.start()
+    yield
+    await change_feed.hub.stop()
+    await background.stop_all()
+
+app = FastAPI(title="Expense Tracker API", lifespan=lifespan)
+
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request: Request, exc: RequestValidationError):
+    # Errors echo the input; orjson writes a rejected NaN/Infinity as null
+    # where the default handler's json.dumps would fail with a 500
+    return FastJSONResponse(status_code=422, content={"detail": jsonable_encoder(exc.errors())})
 
 # Add Prometheus instrumentation
 Instrumentator().instrument(app).expose(app, endpoint="/metrics")
 
+# Negotiated response compression (gzip, plus br/zstd when installed)
+app.add_middleware(CompressionMiddleware)
+
+# Per-user rate limiting and in-flight admission control
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
+
 # CORS config for frontend to call backend APIs
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["https://k8s.dakshayahuja.in"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Report-Source", "X-Report-Age", "Retry-After", "X-Profile", "X-Profile-Pod", "Idempotent-Replayed"],
 )
 
+# Request tracing (no middleware or engine hooks when disabled)
+if TRACING_ENABLED:
+    app.add_middleware(TracingMiddleware)
+    instrument_engine(engine)
+
+# Signed single-request profiling (only installed when a secret is configured)
+if PROFILING_SECRET:
+    app.add_middleware(ProfilingMiddleware)
+
 @app.get("/api/ping")
 def ping():
     return {"message": "pong"}
@@ -27,3 +87,4 @@ run_migrations()
 app.include_router(auth_routes.router, prefix="/api/auth")
 app.include_router(user_settings_routes.router, prefix="/api/user-settings")
 app.include_router(expense_routes.router, prefix="/api/expenses")
+app.include_router(admin_routes.router, prefix="/api/admin")
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from db.database import Base
+from datetime import datetime
+
+class BulkDeleteJob(Base):
+    __tablename__ = "bulk_delete_jobs"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # Expenses of user_id with a generation below this are deleted
+    generation = Column(Integer, nullable=False)
+    status = Column(String, nullable=False, default="pending", index=True)
+    deleted_count = Column(Integer, nullable=False, default=0)
+    error = Column(String, nullable=True)
+    # Runs started; failed jobs are retried with backoff until the cap
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    completed_at = Column(DateTime, nullable=True)
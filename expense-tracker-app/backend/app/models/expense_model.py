@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, ForeignKey
 from sqlalchemy.orm import relationship
 from db.database import Base
 from datetime import datetime
@@ -9,11 +9,16 @@ class Expense(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     title = Column(String, nullable=False)
+    # Integer minor units of the user's currency (see schemas.expense_schema)
+    amount_minor = Column(BigInteger, nullable=False)
+    # Legacy float amount, still written for pods on the previous release
     amount = Column(Float, nullable=False)
     category = Column(String, nullable=False)
     date = Column(DateTime, default=datetime.now)
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    # Matches User.expense_generation while visible; older generations await bulk deletion
+    generation = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Relationship
     user = relationship("User", back_populates="expenses")
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, SmallInteger, String, LargeBinary, DateTime
+from db.database import Base
+from datetime import datetime
+
+class IdempotencyKey(Base):
+    """First response to a mutating request, replayed for retries with the same key"""
+    __tablename__ = "idempotency_keys"
+
+    user_id = Column(Integer, primary_key=True)
+    key = Column(String(255), primary_key=True)
+    request_hash = Column(String(64), nullable=False)
+    status_code = Column(SmallInteger, nullable=False)
+    response_body = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=datetime.now)
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime
+from db.database import Base
+
+class ExpenseMonthlyCategory(Base):
+    """Read-only mapping of the expense_monthly_category_mv materialized view"""
+    __tablename__ = "expense_monthly_category_mv"
+    __table_args__ = {"info": {"is_view": True}}
+
+    user_id = Column(Integer, primary_key=True)
+    month = Column(DateTime, primary_key=True)
+    category = Column(String, primary_key=True)
+    total_amount = Column(Float, nullable=False)
+    total_amount_minor = Column(BigInteger, nullable=False)
+    count = Column(Integer, nullable=False)
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from db.database import Base
+
+class StreamTicket(Base):
+    """Short-lived, single-use credential for opening the change feed"""
+    __tablename__ = "stream_tickets"
+
+    ticket_hash = Column(String(64), primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -12,4 +12,6 @@ class User(Base):
     picture = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
-    is_active = Column(Boolean, default=True) 
\ No newline at end of file
+    is_active = Column(Boolean, default=True)
+    # Bumped by bulk deletes; only expenses of the current generation are visible
+    expense_generation = Column(Integer, nullable=False, default=0, server_default="0") 
\ No newline at end of file
@@ -1,6 +1,57 @@
-from pydantic import BaseModel
+import math
+from pydantic import BaseModel, field_validator, model_validator
 from datetime import datetime
-from typing import Optional
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Optional, List, Dict, Any
+from core.categories import normalize_category
+
+# Amounts are stored as integer hundredths of the major unit, whatever the
+# user's currency: the currency is only a display symbol, so changing it
+# never rewrites stored amounts, and write paths do not need to know it.
+AMOUNT_EXPONENT = 2
+# amount_minor is a BIGINT, but API amounts are JSON numbers (doubles) and the
+# float amount is still dual-written; both hold whole hundredths only up to 2**53
+MAX_AMOUNT_MINOR = 2 ** 53 - 1
+
+def to_minor_units(amount: float) -> int:
+    """Client amount (major units) to integer minor units, rounding half up"""
+    return int((Decimal(str(amount)) * 10 ** AMOUNT_EXPONENT).to_integral_value(ROUND_HALF_UP))
+
+def from_minor_units(amount_minor: int) -> float:
+    return amount_minor / 10 ** AMOUNT_EXPONENT
+
+def amount_columns(amount: float) -> Dict[str, Any]:
+    """Expense column values for an amount; the float column is still dual-written"""
+    amount_minor = to_minor_units(amount)
+    return {"amount_minor": amount_minor, "amount": from_minor_units(amount_minor)}
+
+def amounts_from_minor_units(data):
+    """Convert the *_minor keys of crud results to major-unit API keys, in place.
+
+    Takes a dict or a list of dicts with the same keys (rows); nested dicts
+    are converted too, and list values (columnar series) element-wise.
+    """
+    rows = data if isinstance(data, list) else [data]
+    if not rows:
+        return data
+    scale = 10 ** AMOUNT_EXPONENT
+    renames = [(key, key[:-len("_minor")]) for key in rows[0] if key.endswith("_minor")]
+    nested = [key for key, value in rows[0].items() if isinstance(value, dict)]
+    for row in rows:
+        for key, major_key in renames:
+            value = row.pop(key)
+            row[major_key] = [v / scale for v in value] if isinstance(value, list) else value / scale
+        for key in nested:
+            amounts_from_minor_units(row[key])
+    return data
+
+def validate_amount(amount: float) -> float:
+    """Reject amounts that cannot be stored exactly (NaN, infinities, over MAX_AMOUNT_MINOR)"""
+    if not math.isfinite(amount):
+        raise ValueError("Amount must be a finite number")
+    if abs(to_minor_units(amount)) > MAX_AMOUNT_MINOR:
+        raise ValueError("Amount is out of range")
+    return amount
 
 class ExpenseBase(BaseModel):
     title: str
@@ -9,9 +60,18 @@ class ExpenseBase(BaseModel):
     date: Optional[datetime] = None
 
 class ExpenseCreate(ExpenseBase):
-    pass
+    @field_validator("category")
+    @classmethod
+    def _known_category(cls, value: str) -> str:
+        return normalize_category(value)
+
+    @field_validator("amount")
+    @classmethod
+    def _storable_amount(cls, value: float) -> float:
+        return validate_amount(value)
 
 class ExpenseResponse(ExpenseBase):
+    """Validates from an Expense (amount_minor) or a crud row dict"""
     id: int
     created_at: datetime
     date: datetime
@@ -19,12 +79,57 @@ class ExpenseResponse(ExpenseBase):
     class Config:
         from_attributes = True
 
+    @model_validator(mode="before")
+    @classmethod
+    def _amount_from_minor_units(cls, data: Any) -> Any:
+        if isinstance(data, dict):
+            return amounts_from_minor_units(dict(data))
+        if hasattr(data, "amount_minor"):
+            values = {field: getattr(data, field) for field in cls.model_fields if field != "amount"}
+            values["amount"] = from_minor_units(data.amount_minor)
+            return values
+        return data
+
+class ExpenseSearchResponse(BaseModel):
+    items: List[ExpenseResponse]
+    next_cursor: Optional[str] = None
+
 class ExpenseUpdate(BaseModel):
     title: Optional[str] = None
     amount: Optional[float] = None
     category: Optional[str] = None
     date: Optional[datetime] = None
 
+    @field_validator("category")
+    @classmethod
+    def _known_category(cls, value: Optional[str]) -> Optional[str]:
+        return normalize_category(value) if value is not None else value
+
+    @field_validator("amount")
+    @classmethod
+    def _storable_amount(cls, value: Optional[float]) -> Optional[float]:
+        return validate_amount(value) if value is not None else value
+
+    def to_columns(self) -> Dict[str, Any]:
+        """Column values for the fields that were sent"""
+        values = self.model_dump(exclude_unset=True)
+        amount = values.pop("amount", None)
+        if amount is not None:
+            values.update(amount_columns(amount))
+        return values
+
+class BulkDeleteJobResponse(BaseModel):
+    id: int
+    status: str
+    deleted_count: int
+    error: Optional[str] = None
+    attempts: int = 0
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
 class CategoryReport(BaseModel):
     category: str
     total_amount: float
@@ -36,6 +141,24 @@ class MonthlyReport(BaseModel):
     total_amount: float
     count: int
 
+class AnalyticsSeries(BaseModel):
+    buckets: List[str]
+    total_amount: List[float]
+    count: List[int]
+
+class AnalyticsSummary(BaseModel):
+    total_amount: float
+    count: int
+    previous_total_amount: Optional[float] = None
+    previous_count: Optional[int] = None
+    change_percentage: Optional[float] = None
+
+class AnalyticsReport(AnalyticsSeries):
+    granularity: str
+    category: Optional[str] = None
+    previous: Optional[AnalyticsSeries] = None
+    summary: AnalyticsSummary
+
 class Settings(BaseModel):
     currency: str = "₹"
     theme: str = "light"
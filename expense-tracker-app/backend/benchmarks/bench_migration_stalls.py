@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Benchmark: request stalls while migrations run against live traffic.
+
+Downgrades the database to --target, seeds expenses for a benchmark user,
+then runs `alembic upgrade head` while worker threads keep inserting,
+updating and summing expenses. A blocker transaction holds a read lock on
+expenses for the first --blocker-seconds, like a long report query would.
+
+With the runner's lock_timeout, DDL that cannot get its lock gives up and
+retries, so traffic keeps flowing. With --lock-timeout-ms 0, the DDL waits
+behind the blocker and every query queues behind the DDL.
+
+With --late-blocker the blocker takes its lock once the backfill has
+committed the new amount_minor column and keeps it until --blocker-seconds
+after the backfill ends. The timeout then hits a later step (the NOT NULL
+check), and the retry has to re-run a revision that is partly committed.
+
+Run from the backend directory against a scratch database:
+    DATABASE_URL=postgresql://... python benchmarks/bench_migration_stalls.py --rows 200000
+"""
+import argparse
+import os
+import random
+import subprocess
+import threading
+import time
+
+from sqlalchemy import create_engine, text
+
+APP_DIR = os.path.join(os.path.dirname(__file__), "..", "app")
+STALL_SECONDS = 1.0
+
+def alembic(*args, env=None):
+    return subprocess.run(["alembic", *args], cwd=APP_DIR, env={**os.environ, "PYTHONUNBUFFERED": "1", **(env or {})}, check=True)
+
+def seed(engine, rows: int) -> int:
+    with engine.begin() as conn:
+        user_id = conn.execute(text("""
+            INSERT INTO users (google_id, email, name, created_at, is_active)
+            VALUES ('bench-migrate', 'bench-migrate@example.com', 'Migration Bench', now(), true)
+            ON CONFLICT (google_id) DO UPDATE SET name = EXCLUDED.name
+            RETURNING id
+        """)).scalar()
+        conn.execute(text("DELETE FROM expenses WHERE user_id = :user_id"), {"user_id": user_id})
+        # Only the columns every revision has, like a pod on the old release
+        conn.execute(text("""
+            INSERT INTO expenses (user_id, title, amount, category, date, created_at, updated_at, generation)
+            SELECT :user_id, 'Bench ' || i, round((50 + random() * 950)::numeric, 2), 'Other',
+                   now() - random() * interval '1 year', now(), now(),
+                   (SELECT expense_generation FROM users WHERE id = :user_id)
+            FROM generate_series(1, :rows) AS i
+        """), {"user_id": user_id, "rows": rows})
+    with engine.connect() as conn:
+        conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM ANALYZE expenses"))
+    return user_id
+
+def worker(engine, user_id: int, stop: threading.Event, latencies: list):
+    ops = [
+        text("""
+            INSERT INTO expenses (user_id, title, amount, category, date, created_at, updated_at, generation)
+            VALUES (:user_id, 'Load', 12.5, 'Other', now(), now(), now(),
+                    (SELECT expense_generation FROM users WHERE id = :user_id))
+        """),
+        text("""
+            UPDATE expenses SET amount = amount + 1
+            WHERE id = (SELECT max(id) FROM expenses WHERE user_id = :user_id) - floor(random() * 1000)::int
+        """),
+        text("SELECT sum(amount), count(*) FROM expenses WHERE user_id = :user_id AND date > now() - interval '7 days'"),
+    ]
+    with engine.connect() as conn:
+        while not stop.is_set():
+            started = time.monotonic()
+            with conn.begin():
+                conn.execute(random.choice(ops), {"user_id": user_id})
+            latencies.append((started, time.monotonic() - started))
+
+def blocker(engine, seconds: float, late: bool = False):
+    with engine.connect() as conn:
+        while late and not conn.execute(text(
+            "SELECT 1 FROM information_schema.columns WHERE table_name = 'expenses' AND column_name = 'amount_minor'"
+        )).scalar():
+            conn.rollback()
+            time.sleep(0.05)
+        conn.rollback()
+        with conn.begin():
+            conn.execute(text("SELECT count(*) FROM expenses"))
+            # Row updates are not blocked by this; hold on until the backfill is done
+            while late and conn.execute(text("SELECT 1 FROM expenses WHERE amount_minor IS NULL LIMIT 1")).scalar():
+                time.sleep(0.2)
+            time.sleep(seconds)
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))] if values else 0.0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--target", default="expense_change_feed", help="revision to downgrade to first")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--blocker-seconds", type=float, default=8.0)
+    parser.add_argument("--late-blocker", action="store_true",
+                        help="hold the lock after the backfill has committed instead of from the start")
+    parser.add_argument("--lock-timeout-ms", type=int, default=None,
+                        help="override MIGRATION_LOCK_TIMEOUT_MS (0 disables the guard)")
+    args = parser.parse_args()
+
+    engine = create_engine(os.environ["DATABASE_URL"], pool_size=args.workers + 2)
+
+    print(f"⏪ Downgrading to {args.target}...")
+    alembic("downgrade", args.target)
+    print(f"🌱 Seeding {args.rows} expenses...")
+    user_id = seed(engine, args.rows)
+
+    stop = threading.Event()
+    latencies = []
+    threads = [
+        threading.Thread(target=worker, args=(engine, user_id, stop, latencies), daemon=True)
+        for _ in range(args.workers)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(2)
+    baseline = [latency for _, latency in latencies]
+
+    env = {}
+    if args.lock_timeout_ms is not None:
+        env["MIGRATION_LOCK_TIMEOUT_MS"] = str(args.lock_timeout_ms)
+    if args.blocker_seconds:
+        threading.Thread(target=blocker, args=(engine, args.blocker_seconds, args.late_blocker), daemon=True).start()
+        time.sleep(0.2)
+
+    print("⏩ Upgrading to head under load...")
+    upgrade_started = time.monotonic()
+    alembic("upgrade", "head", env=env)
+    upgrade_seconds = time.monotonic() - upgrade_started
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    during = [latency for started, latency in latencies if started >= upgrade_started]
+    print(f"\nUpgrade took {upgrade_seconds:.2f}s with {args.workers} workers")
+    print(f"{'':<16}{'ops':>8}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}{'stalls':>8}")
+    for label, values in (("before upgrade", baseline), ("during upgrade", during)):
+        stalls = sum(1 for value in values if value >= STALL_SECONDS)
+        print(f"{label:<16}{len(values):>8}{percentile(values, 0.5) * 1000:>10.1f}"
+              f"{percentile(values, 0.99) * 1000:>10.1f}{max(values, default=0) * 1000:>10.1f}{stalls:>8}")
+    print(f"(stalls: operations taking {STALL_SECONDS:.0f}s or more)")
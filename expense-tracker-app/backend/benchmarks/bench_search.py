@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark: expense title search with and without the search indexes.
+
+Seeds a synthetic dataset (1M rows by default) for a few benchmark users,
+then runs EXPLAIN ANALYZE on the search query twice per term: with the
+planner free to use the trigram/tsvector indexes, and with index scans
+disabled (the previous sequential-scan behaviour).
+
+Run from the backend directory against a migrated database:
+    DATABASE_URL=postgresql://... python benchmarks/bench_search.py --rows 1000000
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from sqlalchemy import text
+from db.database import engine
+from core.categories import CATEGORIES
+from crud.expense_crud import _search_query
+
+TERMS = ["Uber", "netflix", "Bil", "Gas Station", "coffe"]
+
+def seed(conn, rows: int, users: int):
+    pairs = [f"{category}|{title}" for category, titles in CATEGORIES.items() for title in titles]
+    user_ids = []
+    for n in range(users):
+        user_id = conn.execute(text("""
+            INSERT INTO users (google_id, email, name, created_at, is_active)
+            VALUES (:google_id, :email, 'Search Bench', now(), true)
+            ON CONFLICT (google_id) DO UPDATE SET name = EXCLUDED.name
+            RETURNING id
+        """), {"google_id": f"bench-search-{n}", "email": f"bench-search-{n}@example.com"}).scalar()
+        user_ids.append(user_id)
+
+    conn.execute(text("DELETE FROM expenses WHERE user_id = ANY(:ids)"), {"ids": user_ids})
+    conn.execute(text("""
+        INSERT INTO expenses (user_id, title, amount_minor, amount, category, date, created_at, updated_at)
+        SELECT (:ids)[1 + i % cardinality(CAST(:ids AS int[]))],
+               split_part(pair, '|', 2),
+               amount_minor,
+               amount_minor / 100.0,
+               split_part(pair, '|', 1),
+               now() - random() * interval '5 years',
+               now(), now()
+        FROM (
+            SELECT i,
+                   (CAST(:pairs AS text[]))[1 + floor(random() * cardinality(CAST(:pairs AS text[])))::int] AS pair,
+                   5000 + floor(random() * 95000)::bigint AS amount_minor
+            FROM generate_series(1, :rows) AS i
+        ) generated
+    """), {"ids": user_ids, "pairs": pairs, "rows": rows})
+    conn.commit()
+    conn.execute(text("ANALYZE expenses"))
+    conn.commit()
+    return user_ids
+
+def explain(conn, user_id: int, term: str, use_indexes: bool):
+    query, params = _search_query(user_id, term, limit=20)
+    with conn.begin():
+        if not use_indexes:
+            conn.execute(text("SET LOCAL enable_indexscan = off"))
+            conn.execute(text("SET LOCAL enable_bitmapscan = off"))
+        plan = conn.execute(text("EXPLAIN (ANALYZE, FORMAT JSON) " + query.text), params).scalar()[0]
+
+    def scan_types(node):
+        found = {node["Node Type"]} if "Scan" in node["Node Type"] else set()
+        for child in node.get("Plans", []):
+            found |= scan_types(child)
+        return found
+
+    return plan["Execution Time"], ", ".join(sorted(scan_types(plan["Plan"])))
+
+def explain_text(conn, user_id: int, term: str) -> str:
+    query, params = _search_query(user_id, term, limit=20)
+    with conn.begin():
+        rows = conn.execute(text("EXPLAIN (ANALYZE, BUFFERS) " + query.text), params).all()
+    return "\n".join(row[0] for row in rows)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--skip-seed", action="store_true")
+    parser.add_argument("--plan", metavar="TERM", help="also print the full indexed EXPLAIN ANALYZE for TERM")
+    args = parser.parse_args()
+
+    with engine.connect() as conn:
+        if args.skip_seed:
+            user_ids = conn.execute(
+                text("SELECT id FROM users WHERE google_id LIKE 'bench-search-%' ORDER BY id")
+            ).scalars().all()
+            conn.commit()
+        else:
+            print(f"🌱 Seeding {args.rows} expenses for {args.users} users...")
+            user_ids = seed(conn, args.rows, args.users)
+
+        user_id = user_ids[0]
+        print(f"{'term':<14}{'indexed ms':>12}{'seq ms':>12}  plan (indexed | seq)")
+        for term in TERMS:
+            indexed_ms, indexed_plan = explain(conn, user_id, term, use_indexes=True)
+            seq_ms, seq_plan = explain(conn, user_id, term, use_indexes=False)
+            print(f"{term:<14}{indexed_ms:>12.2f}{seq_ms:>12.2f}  {indexed_plan} | {seq_plan}")
+
+        if args.plan:
+            print(f"\nIndexed plan for {args.plan!r}:")
+            print(explain_text(conn, user_id, args.plan))
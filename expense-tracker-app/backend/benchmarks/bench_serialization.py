@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: CPU time to serialize 1,000 expense rows.
+
+Compares the previous list path (ORM object -> ExpenseResponse validation ->
+jsonable_encoder -> json) with the fast path (column tuples -> dicts -> orjson).
+
+Run from the backend directory:
+    python benchmarks/bench_serialization.py
+"""
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from schemas.expense_schema import ExpenseResponse, amounts_from_minor_units
+
+ROWS = 1000
+ROUNDS = 50
+FIELDS = ("id", "title", "amount_minor", "category", "date", "created_at")
+
+def make_rows():
+    now = datetime.now()
+    return [
+        (
+            i,
+            random.choice(["Uber Ride", "Netflix", "Groceries", "Phone Bill"]),
+            random.randint(5000, 100000),
+            random.choice(["Transport", "Entertainment", "Food", "Utilities"]),
+            now - timedelta(days=random.randint(0, 365)),
+            now,
+        )
+        for i in range(ROWS)
+    ]
+
+def orm_path(rows):
+    objects = [SimpleNamespace(**dict(zip(FIELDS, row))) for row in rows]
+    validated = [ExpenseResponse.model_validate(obj) for obj in objects]
+    return json.dumps(jsonable_encoder(validated)).encode()
+
+def fast_path(rows):
+    return orjson.dumps(amounts_from_minor_units([dict(zip(FIELDS, row)) for row in rows]))
+
+def measure(fn, rows):
+    fn(rows)  # warm up
+    start = time.process_time()
+    for _ in range(ROUNDS):
+        fn(rows)
+    return (time.process_time() - start) / ROUNDS * 1000
+
+if __name__ == "__main__":
+    rows = make_rows()
+    before = measure(orm_path, rows)
+    after = measure(fast_path, rows)
+    print(f"CPU per {ROWS} rows (ms): before={before:.2f} after={after:.2f} speedup={before / after:.1f}x")
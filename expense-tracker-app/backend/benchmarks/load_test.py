@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Load test: per-pod capacity of the backend under realistic user sessions.
+
+Creates --users synthetic users directly in Postgres, mints their JWTs with
+JWT_SECRET (no Google sign-in), seeds their expenses through the API, then
+ramps the number of concurrent sessions through --stages. Each session:
+
+  sign-in        GET /api/auth/me, GET /api/user-settings
+  list paging    1-3 pages of GET /api/expenses/
+  edit burst     POST 1-3 expenses, PUT each, DELETE each (--write-ratio)
+  report views   summary, categories and monthly reports (--report-ratio)
+
+Every stage records throughput, latency percentiles and errors, the peak
+number of connections in pg_stat_activity, and, with --pid, the backend's
+CPU time per request from /proc/<pid>/stat (descendants included, so a
+uvicorn --workers parent works too). The largest stage meeting --p99-ms
+is the pod's sustainable RPS. It is turned into suggested resources and an
+HPA for manifests/expense-tracker/backend.yaml, written to --report.
+
+Run the backend as one pod would (one process, same env as the cluster),
+against a database no other backend uses, since connections are counted for
+the whole database. Run this from the backend directory, on other cores if
+possible:
+    cd app && uvicorn main:app --port 8000 &
+    DATABASE_URL=postgresql://... JWT_SECRET=... \\
+        python benchmarks/load_test.py --pid $(pgrep -of "uvicorn main:app") --stages 4,8,16,32,64
+
+The per-user rate limit (RATE_LIMIT_REFILL_PER_SECOND) applies. 429/503
+responses are counted as shed, not errors. Use enough --users, or run the
+backend with RATE_LIMIT_ENABLED=false, to measure raw capacity.
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import jwt
+from sqlalchemy import create_engine, text
+
+CATEGORIES = ["Food", "Entertainment", "Health", "Utilities", "Transport", "Shopping", "Other"]
+PAGE_SIZE = 20
+SHED_STATUSES = (429, 503)
+CLK_TCK = os.sysconf("SC_CLK_TCK")
+# Tags this script's own connections so they are not counted as the backend's
+APPLICATION_NAME = "load_test"
+# SQLAlchemy's default QueuePool (5 + 10 overflow) plus the change feed's LISTEN connection
+DEFAULT_CONNECTIONS_PER_POD = 16
+
+def create_users(engine, count: int) -> list:
+    user_ids = []
+    with engine.begin() as conn:
+        for n in range(count):
+            user_ids.append(conn.execute(text("""
+                INSERT INTO users (google_id, email, name, created_at, is_active)
+                VALUES (:google_id, :email, 'Load Test', now(), true)
+                ON CONFLICT (google_id) DO UPDATE SET name = EXCLUDED.name
+                RETURNING id
+            """), {"google_id": f"load-test-{n}", "email": f"load-test-{n}@example.com"}).scalar())
+    return user_ids
+
+def mint_token(user_id: int) -> str:
+    expires = datetime.now(timezone.utc) + timedelta(hours=6)
+    return jwt.encode({"user_id": user_id, "exp": expires}, os.environ["JWT_SECRET"], algorithm="HS256")
+
+def process_tree(pid: int) -> list:
+    """pid and all of its descendants (uvicorn --workers, wrapper shells)"""
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    parents[int(entry)] = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+    pids = [pid]
+    for current in pids:
+        pids.extend(child for child, parent in parents.items() if parent == current)
+    return pids
+
+def cpu_seconds(pids: list) -> float:
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            total += int(fields[11]) + int(fields[12])  # utime + stime
+        except OSError:
+            continue
+    return total / CLK_TCK
+
+def rss_bytes(pids: list) -> int:
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+        except OSError:
+            continue
+    return total
+
+def db_connections(engine) -> dict:
+    with engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT state, count(*) FROM pg_stat_activity
+            WHERE datname = current_database() AND backend_type = 'client backend'
+              AND application_name <> :application_name
+            GROUP BY state
+        """), {"application_name": APPLICATION_NAME}).all()
+    return {state or "unknown": count for state, count in rows}
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))] if values else 0.0
+
+class Recorder:
+    def __init__(self):
+        self.samples = []  # (endpoint, status, seconds); status 0 for transport errors
+
+    async def call(self, client, method: str, url: str, endpoint: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            status = response.status_code
+        except httpx.HTTPError:
+            response, status = None, 0
+        self.samples.append((endpoint, status, time.perf_counter() - started))
+        return response if response is not None and response.is_success else None
+
+async def think(seconds: float):
+    if seconds:
+        await asyncio.sleep(random.expovariate(1 / seconds))
+
+def random_expense() -> dict:
+    return {
+        "title": random.choice(["Coffee", "Groceries", "Uber Ride", "Netflix", "Pharmacy"]),
+        "amount": round(random.uniform(5, 500), 2),
+        "category": random.choice(CATEGORIES),
+        "date": (datetime.now() - timedelta(days=random.randint(0, 60))).isoformat()
+    }
+
+async def session(client, recorder: Recorder, headers: dict, args):
+    """One user visit: sign-in, list paging, maybe an edit burst, maybe reports"""
+    call = recorder.call
+    await call(client, "GET", "/api/auth/me", "GET /api/auth/me", headers=headers)
+    await call(client, "GET", "/api/user-settings", "GET /api/user-settings", headers=headers)
+    for page in range(random.randint(1, 3)):
+        await think(args.think)
+        await call(client, "GET", f"/api/expenses/?skip={page * PAGE_SIZE}&limit={PAGE_SIZE}",
+                   "GET /api/expenses/", headers=headers)
+
+    if random.random() < args.write_ratio:
+        created = []
+        for _ in range(random.randint(1, 3)):
+            await think(args.think)
+            response = await call(client, "POST", "/api/expenses/", "POST /api/expenses/",
+                                  headers=headers, json=random_expense())
+            if response is not None:
+                created.append(response.json()["id"])
+        for expense_id in created:
+            await think(args.think)
+            await call(client, "PUT", f"/api/expenses/{expense_id}", "PUT /api/expenses/{id}",
+                       headers=headers, json={"amount": round(random.uniform(5, 500), 2)})
+        # Delete what was created so the dataset stays the same size across stages
+        for expense_id in created:
+            await call(client, "DELETE", f"/api/expenses/{expense_id}", "DELETE /api/expenses/{id}",
+                       headers=headers)
+
+    if random.random() < args.report_ratio:
+        for report in ("summary", "categories", "monthly"):
+            await think(args.think)
+            await call(client, "GET", f"/api/expenses/reports/{report}",
+                       f"GET /api/expenses/reports/{report}", headers=headers)
+
+async def sample_resources(engine, pids: list, stop: asyncio.Event, peaks: dict):
+    while not stop.is_set():
+        connections = await asyncio.to_thread(db_connections, engine)
+        total = sum(connections.values())
+        if total >= peaks["connections"]:
+            peaks["connections"], peaks["connection_states"] = total, connections
+        if pids:
+            peaks["rss"] = max(peaks["rss"], rss_bytes(pids))
+        try:
+            await asyncio.wait_for(stop.wait(), 0.5)
+        except asyncio.TimeoutError:
+            pass
+
+async def run_stage(client, engine, tokens: list, pids: list, concurrency: int, args) -> dict:
+    recorder = Recorder()
+    deadline = time.monotonic() + args.stage_seconds
+
+    async def virtual_user():
+        # Each session signs in as a random user, like many people taking turns
+        while time.monotonic() < deadline:
+            headers = {"Authorization": f"Bearer {random.choice(tokens)}"}
+            await session(client, recorder, headers, args)
+
+    stop = asyncio.Event()
+    peaks = {"connections": 0, "connection_states": {}, "rss": 0}
+    sampler = asyncio.create_task(sample_resources(engine, pids, stop, peaks))
+    cpu_before, started = cpu_seconds(pids), time.monotonic()
+    await asyncio.gather(*(virtual_user() for _ in range(concurrency)))
+    elapsed = time.monotonic() - started
+    cpu_used = cpu_seconds(pids) - cpu_before
+    stop.set()
+    await sampler
+
+    latencies = [seconds for _, status, seconds in recorder.samples]
+    ok = sum(1 for _, status, _ in recorder.samples if 200 <= status < 400)
+    shed = sum(1 for _, status, _ in recorder.samples if status in SHED_STATUSES)
+    errors = len(recorder.samples) - ok - shed
+    by_endpoint = {}
+    for endpoint, status, seconds in recorder.samples:
+        by_endpoint.setdefault(endpoint, []).append(seconds)
+    return {
+        "concurrency": concurrency,
+        "requests": len(recorder.samples),
+        "rps": ok / elapsed,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "error_rate": errors / max(len(recorder.samples), 1),
+        "shed_rate": shed / max(len(recorder.samples), 1),
+        "cpu_ms_per_request": cpu_used * 1000 / max(len(recorder.samples), 1) if pids else None,
+        "cpu_cores": cpu_used / elapsed if pids else None,
+        "db_connections": peaks["connections"],
+        "db_connection_states": peaks["connection_states"],
+        "rss": peaks["rss"],
+        "endpoints": {endpoint: (len(values), percentile(values, 0.99)) for endpoint, values in by_endpoint.items()},
+    }
+
+def sustainable(stage: dict, args) -> bool:
+    return stage["p99"] * 1000 <= args.p99_ms and stage["error_rate"] <= args.max_error_rate
+
+def millicores(cores: float) -> str:
+    return f"{max(50, math.ceil(cores * 1000 / 50) * 50)}m"
+
+def mebibytes(size: int) -> str:
+    return f"{max(64, math.ceil(size / 2 ** 20 / 32) * 32)}Mi"
+
+def recommendations(best: dict, stages: list, max_connections: int, args) -> list:
+    lines = []
+    peak_rss = max(stage["rss"] for stage in stages)
+    per_pod_connections = max(args.connections_per_pod, max(stage["db_connections"] for stage in stages))
+    # Leave 20% of max_connections for migrations, admin sessions and rollouts
+    max_replicas = max(2, int(max_connections * 0.8 // per_pod_connections))
+    scale_out_rps = best["rps"] * args.hpa_target / 100
+
+    min_replicas = 2
+    if args.expected_peak_rps:
+        min_replicas = max(2, math.ceil(args.expected_peak_rps / scale_out_rps))
+    lines.append(f"- One pod sustains **{best['rps']:.0f} RPS** at p99 {best['p99'] * 1000:.0f} ms "
+                 f"(target {args.p99_ms} ms) with {best['concurrency']} concurrent sessions.")
+    lines.append(f"- With the HPA at {args.hpa_target}% CPU, pods scale out at about "
+                 f"{scale_out_rps:.0f} RPS each.")
+    lines.append(f"- Each pod can hold up to {per_pod_connections} Postgres connections. With "
+                 f"max_connections={max_connections}, maxReplicas is capped at {max_replicas}. "
+                 "Raise it only after adding a pooler such as PgBouncer.")
+    if args.expected_peak_rps:
+        lines.append(f"- Expected peak {args.expected_peak_rps} RPS needs minReplicas={min_replicas}.")
+
+    resources = []
+    if best["cpu_cores"] is not None:
+        lines.append(f"- CPU at that load: {best['cpu_cores']:.2f} cores "
+                     f"({best['cpu_ms_per_request']:.1f} ms per request). This is the CPU request, so "
+                     "HPA utilization is measured against real capacity.")
+        last = stages[-1]
+        if last is not best and last["rps"] < best["rps"] * 1.1 and last["cpu_cores"] < 0.8 * os.cpu_count():
+            lines.append(f"- ⚠️ RPS stopped growing while the backend used {last['cpu_cores']:.2f} of "
+                         f"{os.cpu_count()} cores. The limit is not this pod's CPU: check Postgres, the "
+                         "connection pool, or the load generator sharing the host. A CPU-based HPA "
+                         "will not scale on this bottleneck.")
+        resources = [
+            "        resources:",
+            "          requests:",
+            f"            cpu: {millicores(best['cpu_cores'])}",
+            f"            memory: {mebibytes(peak_rss * 1.25)}",
+            "          limits:",
+            f"            memory: {mebibytes(peak_rss * 2)}",
+        ]
+    else:
+        lines.append("- CPU was not measured (no --pid), so no resource requests are suggested.")
+
+    lines += [
+        "",
+        "Suggested settings for `manifests/expense-tracker/backend.yaml`. Remove `replicas: 2`",
+        "from the Deployment once the HPA owns the replica count:",
+        "",
+        "```yaml",
+    ]
+    if resources:
+        lines += ["# Deployment backend, container app", *resources, "---"]
+    lines += [
+        "apiVersion: autoscaling/v2",
+        "kind: HorizontalPodAutoscaler",
+        "metadata:",
+        "  name: backend",
+        "  namespace: expense-tracker",
+        "spec:",
+        "  scaleTargetRef:",
+        "    apiVersion: apps/v1",
+        "    kind: Deployment",
+        "    name: backend",
+        f"  minReplicas: {min_replicas}",
+        f"  maxReplicas: {max_replicas}",
+        "  metrics:",
+        "  - type: Resource",
+        "    resource:",
+        "      name: cpu",
+        "      target:",
+        "        type: Utilization",
+        f"        averageUtilization: {args.hpa_target}",
+        "```",
+    ]
+    return lines
+
+def write_report(path: str, stages: list, max_connections: int, args):
+    lines = [
+        "# Backend capacity report",
+        "",
+        f"Generated {datetime.now().isoformat(timespec='seconds')} against {args.base_url} "
+        f"with {args.users} users, {args.stage_seconds:.0f}s per stage, think time {args.think * 1000:.0f} ms, "
+        f"write ratio {args.write_ratio}, report ratio {args.report_ratio}.",
+        "",
+        "| sessions | RPS | p50 ms | p95 ms | p99 ms | errors | shed | CPU ms/req | cores | DB conns | RSS MiB |",
+        "|---|---|---|---|---|---|---|---|---|---|---|",
+    ]
+    for stage in stages:
+        cpu = f"{stage['cpu_ms_per_request']:.1f}" if stage["cpu_ms_per_request"] is not None else "-"
+        cores = f"{stage['cpu_cores']:.2f}" if stage["cpu_cores"] is not None else "-"
+        rss = f"{stage['rss'] / 2 ** 20:.0f}" if stage["rss"] else "-"
+        mark = "" if sustainable(stage, args) else " ✗"
+        lines.append(
+            f"| {stage['concurrency']}{mark} | {stage['rps']:.1f} | {stage['p50'] * 1000:.0f} | "
+            f"{stage['p95'] * 1000:.0f} | {stage['p99'] * 1000:.0f} | {stage['error_rate']:.1%} | "
+            f"{stage['shed_rate']:.1%} | {cpu} | {cores} | {stage['db_connections']} | {rss} |"
+        )
+    lines += ["", "✗ = p99 or error rate over target.", ""]
+
+    passing = [stage for stage in stages if sustainable(stage, args)]
+    lines.append("## Capacity")
+    lines.append("")
+    if passing:
+        best = max(passing, key=lambda stage: stage["rps"])
+        lines += recommendations(best, stages, max_connections, args)
+        lines += ["", f"## Endpoints at {best['concurrency']} sessions", "",
+                  "| endpoint | requests | p99 ms |", "|---|---|---|"]
+        for endpoint, (count, p99) in sorted(best["endpoints"].items(), key=lambda item: -item[1][1]):
+            lines.append(f"| `{endpoint}` | {count} | {p99 * 1000:.0f} |")
+        states = ", ".join(f"{state}: {count}" for state, count in sorted(best["db_connection_states"].items()))
+        lines += ["", f"Peak DB connections at {best['concurrency']} sessions by state: {states or 'none'}."]
+    else:
+        lines.append(f"No stage met p99 ≤ {args.p99_ms} ms. Start with fewer sessions (--stages).")
+
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+async def main(args):
+    engine = create_engine(
+        os.environ["DATABASE_URL"], pool_size=2, connect_args={"application_name": APPLICATION_NAME}
+    )
+    with engine.connect() as conn:
+        max_connections = int(conn.execute(text("SHOW max_connections")).scalar())
+    pids = process_tree(args.pid) if args.pid else []
+
+    print(f"👥 Creating {args.users} users...")
+    tokens = [mint_token(user_id) for user_id in create_users(engine, args.users)]
+
+    stages = []
+    limits = httpx.Limits(max_connections=max(args.stages) + 10, max_keepalive_connections=max(args.stages) + 10)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        if args.expenses_per_user:
+            print(f"🌱 Seeding {args.expenses_per_user} expenses per user...")
+            semaphore = asyncio.Semaphore(8)
+
+            async def seed(token):
+                async with semaphore:
+                    response = await client.post(f"/api/expenses/seed?count={args.expenses_per_user}",
+                                                 headers={"Authorization": f"Bearer {token}"})
+                    response.raise_for_status()
+
+            await asyncio.gather(*(seed(token) for token in tokens))
+
+        for concurrency in args.stages:
+            stage = await run_stage(client, engine, tokens, pids, concurrency, args)
+            stages.append(stage)
+            cpu = f" cpu {stage['cpu_ms_per_request']:.1f}ms/req" if stage["cpu_ms_per_request"] is not None else ""
+            print(f"{'✅' if sustainable(stage, args) else '❌'} {concurrency:>4} sessions: "
+                  f"{stage['rps']:7.1f} rps  p99 {stage['p99'] * 1000:6.0f} ms  "
+                  f"errors {stage['error_rate']:.1%}  shed {stage['shed_rate']:.1%}  "
+                  f"db {stage['db_connections']}{cpu}")
+            if not sustainable(stage, args) and not args.keep_going:
+                break
+
+    write_report(args.report, stages, max_connections, args)
+    print(f"📄 Capacity report written to {args.report}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--pid", type=int, help="backend process id, for CPU and memory (local backend only)")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--expenses-per-user", type=int, default=50, help="seeded per user first; 0 skips seeding")
+    parser.add_argument("--stages", type=lambda value: [int(v) for v in value.split(",")], default=[4, 8, 16, 32, 64],
+                        help="comma-separated concurrent sessions per stage")
+    parser.add_argument("--stage-seconds", type=float, default=30)
+    parser.add_argument("--think", type=float, default=0.05, help="mean seconds between a session's requests")
+    parser.add_argument("--write-ratio", type=float, default=0.3, help="share of sessions with an edit burst")
+    parser.add_argument("--report-ratio", type=float, default=0.4, help="share of sessions viewing reports")
+    parser.add_argument("--p99-ms", type=int, default=500)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--hpa-target", type=int, default=70, help="HPA CPU utilization target, percent")
+    parser.add_argument("--expected-peak-rps", type=float, help="peak traffic, to size minReplicas")
+    parser.add_argument("--connections-per-pod", type=int, default=DEFAULT_CONNECTIONS_PER_POD)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--keep-going", action="store_true", help="run every stage even after one misses the target")
+    parser.add_argument("--report", default="capacity-report.md")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+# The app imports modules from app/ as top-level packages
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+# db.database connects at import; tests that need Postgres set DATABASE_URL themselves
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/test.db")
+os.environ.setdefault("JWT_SECRET", "test-secret-at-least-32-bytes-long")
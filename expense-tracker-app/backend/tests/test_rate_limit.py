@@ -0,0 +1,81 @@
+import asyncio
+import fakeredis
+import jwt
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+from core import change_feed, rate_limit
+from core.auth import JWT_ALGORITHM, JWT_SECRET
+from db.database import DB_MAX_OVERFLOW, DB_POOL_SIZE
+
+@pytest.fixture
+def redis_server():
+    return fakeredis.FakeServer()
+
+def redis_backend(server, capacity=10, refill_per_second=1):
+    """RedisBackend talking to an in-process Redis stand-in"""
+    backend = rate_limit.RedisBackend("redis://localhost:6379/0", capacity, refill_per_second)
+    backend.client = fakeredis.FakeAsyncRedis(server=server)
+    backend.script = backend.client.register_script(rate_limit.TOKEN_BUCKET_SCRIPT)
+    return backend
+
+def scope(path="/api/expenses", headers=(), query_string=b"", client=("10.0.0.7", 5000)):
+    return {
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "headers": list(headers),
+        "query_string": query_string,
+        "client": client,
+    }
+
+def test_redis_backend_spends_and_rejects(redis_server):
+    backend = redis_backend(redis_server)
+
+    async def run():
+        assert await backend.acquire("user:1", 6) == (True, 0.0)
+        allowed, retry_after = await backend.acquire("user:1", 6)
+        assert not allowed
+        assert 1.9 < retry_after <= 2.0
+        # Other keys have their own bucket
+        assert (await backend.acquire("user:2", 6))[0]
+
+    asyncio.run(run())
+
+def test_redis_backend_shares_buckets_between_replicas(redis_server):
+    first, second = redis_backend(redis_server), redis_backend(redis_server)
+
+    async def run():
+        assert (await first.acquire("ip:203.0.113.9", 10))[0]
+        assert not (await second.acquire("ip:203.0.113.9", 1))[0]
+
+    asyncio.run(run())
+
+def test_redis_backend_fails_open(redis_server):
+    backend = redis_backend(redis_server)
+    redis_server.connected = False
+
+    assert asyncio.run(backend.acquire("user:1", 1000)) == (True, 0.0)
+
+def test_client_key_uses_jwt_user():
+    token = jwt.encode({"user_id": 42}, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    headers = [(b"authorization", f"Bearer {token}".encode())]
+
+    assert asyncio.run(rate_limit.client_key(scope(headers=headers))) == "user:42"
+
+def test_client_key_uses_stream_ticket_user(monkeypatch):
+    monkeypatch.setattr(change_feed, "peek_ticket", lambda ticket: 7 if ticket == "good" else None)
+
+    stream = "/api/expenses/changes"
+    assert asyncio.run(rate_limit.client_key(scope(stream, query_string=b"ticket=good"))) == "user:7"
+    assert asyncio.run(rate_limit.client_key(scope(stream, query_string=b"ticket=bad"))) == "ip:10.0.0.7"
+    # Tickets only identify the stream
+    assert asyncio.run(rate_limit.client_key(scope(query_string=b"ticket=good"))) == "ip:10.0.0.7"
+
+def test_pool_capacity(monkeypatch):
+    assert isinstance(rate_limit.engine.pool, QueuePool)
+    assert rate_limit._pool_capacity() == DB_POOL_SIZE + DB_MAX_OVERFLOW
+
+    # sqlite :memory: gets a SingletonThreadPool, which has no overflow
+    monkeypatch.setattr(rate_limit, "engine", create_engine("sqlite://"))
+    assert rate_limit._pool_capacity() == DB_POOL_SIZE
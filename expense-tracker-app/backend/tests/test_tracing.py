@@ -0,0 +1,67 @@
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+from core import tracing
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+def make_client(monkeypatch) -> TestClient:
+    monkeypatch.setattr(tracing, "TRACING_ENABLED", True)
+    monkeypatch.setattr(tracing, "exporter", tracing.InMemoryExporter())
+
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    tracing.instrument_engine(engine)
+
+    router = APIRouter(prefix="/api/items")
+
+    @router.get("/{item_id}")
+    def read_item(item_id: int):
+        with tracing.start_span("load-item", item_id=item_id):
+            with engine.connect() as conn:
+                return {"id": conn.execute(text("SELECT :id"), {"id": item_id}).scalar()}
+
+    app = FastAPI()
+    app.include_router(router)
+    app.add_middleware(tracing.TracingMiddleware)
+    return TestClient(app)
+
+def spans_by_name():
+    return {span["name"]: span for span in tracing.exporter.spans}
+
+def test_request_spans_are_linked(monkeypatch):
+    client = make_client(monkeypatch)
+
+    response = client.get("/api/items/7", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})
+
+    assert response.json() == {"id": 7}
+    spans = spans_by_name()
+    assert set(spans) == {"GET /api/items/{item_id}", "load-item", "db.query"}
+
+    root = spans["GET /api/items/{item_id}"]
+    assert root["attributes"]["http.route"] == "/api/items/{item_id}"
+    assert root["attributes"]["http.target"] == "/api/items/7"
+    assert root["attributes"]["http.status_code"] == 200
+    # The incoming traceparent is continued
+    assert root["parent_id"] == PARENT_ID
+    assert {span["trace_id"] for span in spans.values()} == {TRACE_ID}
+
+    assert spans["load-item"]["parent_id"] == root["span_id"]
+    assert spans["load-item"]["attributes"]["item_id"] == 7
+    assert spans["db.query"]["parent_id"] == spans["load-item"]["span_id"]
+    assert spans["db.query"]["attributes"]["db.statement"] == "SELECT ?"
+
+def test_unsampled_fast_requests_are_not_exported(monkeypatch):
+    client = make_client(monkeypatch)
+
+    client.get("/api/items/7", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-00"})
+
+    assert tracing.exporter.spans == []
+
+def test_spans_outside_requests_are_noops(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACING_ENABLED", True)
+
+    with tracing.start_span("background") as span:
+        span.set_attribute("ignored", True)
+    assert tracing.inject_headers({"a": "b"}) == {"a": "b"}
@@ -8,7 +8,7 @@ import { useAuth } from "./contexts/AuthContext";
 import { getAvailableCategories } from "./utils/categoryMapping";
 
 const App = () => {
-  const { user, loading, logout } = useAuth();
+  const { user, loading, logout, token } = useAuth();
   const [avatarSrc, setAvatarSrc] = useState(null);
   useEffect(() => {
     setAvatarSrc(user?.picture || null);
@@ -30,6 +30,7 @@ const App = () => {
   const [showAddModal, setShowAddModal] = useState(false);
   const [showSettings, setShowSettings] = useState(false);
   const [showReports, setShowReports] = useState(false);
+  const [reportsVersion, setReportsVersion] = useState(0);
   const [showSeedModal, setShowSeedModal] = useState(false);
   const [seedCount, setSeedCount] = useState(10);
   const [customSeedCount, setCustomSeedCount] = useState("");
@@ -56,6 +57,67 @@ const App = () => {
     }
   }, [user]);
 
+  // Apply changes pushed by the server (from this or any other tab/device)
+  useEffect(() => {
+    if (!user || !token) return;
+    let source = null;
+    let retryTimer = null;
+    let stopped = false;
+    let lastEventId = null;
+
+    const upsertExpense = (event) => {
+      const expense = JSON.parse(event.data);
+      setExpenses(prevExpenses =>
+        prevExpenses.some(e => e.id === expense.id)
+          ? prevExpenses.map(e => (e.id === expense.id ? expense : e))
+          : [expense, ...prevExpenses]
+      );
+    };
+    const removeExpense = (event) => {
+      const { id } = JSON.parse(event.data);
+      setExpenses(prevExpenses => prevExpenses.filter(e => e.id !== id));
+    };
+    const tracked = (handler) => (event) => {
+      lastEventId = event.lastEventId || lastEventId;
+      handler(event);
+    };
+
+    // EventSource cannot send headers, so each connection uses a short-lived,
+    // single-use ticket. Its own reconnects would reuse a spent ticket, so on
+    // error reconnect here with a fresh one and resume from the last event.
+    const connect = async () => {
+      try {
+        const response = await axios.post(`${import.meta.env.VITE_API_URL}/expenses/changes/ticket`);
+        if (stopped) return;
+        const resume = lastEventId ? `&last_event_id=${encodeURIComponent(lastEventId)}` : '';
+        source = new EventSource(
+          `${import.meta.env.VITE_API_URL}/expenses/changes?ticket=${encodeURIComponent(response.data.ticket)}${resume}`
+        );
+      } catch (error) {
+        console.error("Error opening change feed:", error);
+        if (!stopped) retryTimer = setTimeout(connect, 5000);
+        return;
+      }
+      source.addEventListener('created', tracked(upsertExpense));
+      source.addEventListener('updated', tracked(upsertExpense));
+      source.addEventListener('deleted', tracked(removeExpense));
+      source.addEventListener('reset', tracked(() => loadExpenses()));
+      source.addEventListener('resync', () => loadExpenses());
+      source.addEventListener('reports', () => setReportsVersion(v => v + 1));
+      source.onerror = () => {
+        source.close();
+        if (!stopped) retryTimer = setTimeout(connect, 5000);
+      };
+    };
+
+    connect();
+    return () => {
+      stopped = true;
+      clearTimeout(retryTimer);
+      if (source) source.close();
+    };
+  }, [user, token]);
+
   useEffect(() => {
     // Apply theme on initial load
     document.documentElement.classList.toggle("dark", settings.theme === "dark");
@@ -568,6 +630,7 @@ const App = () => {
         <Reports
           onClose={() => setShowReports(false)}
           currency={settings.currency}
+          refreshKey={reportsVersion}
         />
       )}
 
@@ -2,7 +2,7 @@ import { useState, useEffect } from 'react';
 import axios from 'axios';
 import { getCategoryEmoji, getCategoryColor } from '../utils/categoryMapping';
 
-const Reports = ({ onClose, currency = '₹' }) => {
+const Reports = ({ onClose, currency = '₹', refreshKey = 0 }) => {
   const [reports, setReports] = useState({
     summary: null,
     categories: [],
@@ -11,9 +11,10 @@ const Reports = ({ onClose, currency = '₹' }) => {
   const [loading, setLoading] = useState(true);
   const [activeTab, setActiveTab] = useState('summary');
 
+  // refreshKey changes when the change feed says reports are out of date
   useEffect(() => {
     loadReports();
-  }, []);
+  }, [refreshKey]);
 
   const loadReports = async () => {
     try {